@@ -0,0 +1,635 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from GomokuGame import *
+from GomokuParallel import ParallelSearch
+from GomokuNumpy import NumpyEvaluator
+
+
+def midgamePosition(boardSize, stones, seed):
+    rng = random.Random(seed)
+    game = Gomoku(boardSize)
+    center = boardSize // 2
+    moves = [(center, center, miniMaxAI)]
+    game.makeMove(center, center, miniMaxAI)
+    player = AlphaBetaAI
+    while len(moves) < stones:
+        candidates = sorted(game.getValidMoves())
+        row, col = candidates[rng.randrange(len(candidates))]
+        game.makeMove(row, col, player)
+        if game.isWinningMove(row, col):
+            game.undoMove(row, col)
+            continue
+        moves.append((row, col, player))
+        player = miniMaxAI if player == AlphaBetaAI else AlphaBetaAI
+    return moves
+
+
+def loadPosition(boardSize, moves, backend="list", **options):
+    game = Gomoku(boardSize, backend=backend, **options)
+    for row, col, player in moves:
+        game.makeMove(row, col, player)
+    return game
+
+
+def timeSearch(game, depth, engine=AlphaBetaAI):
+    random.seed(0)
+    game.nodeCount = 0
+    start = time.perf_counter()
+    if engine == AlphaBetaAI:
+        game.alphaBeta(depth, True)
+    else:
+        game.minimax(0, True, depth)
+    elapsed = time.perf_counter() - start
+    return game.nodeCount, elapsed
+
+
+def timeCalls(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return repeat / (time.perf_counter() - start)
+
+
+def benchBackends(args):
+    for size in args.sizes:
+        positions = [midgamePosition(size, args.stones, seed) for seed in range(args.positions)]
+        results = {}
+        for backend in ("list", "bitboard"):
+            nodes, elapsed = 0, 0.0
+            for moves in positions:
+                n, t = timeSearch(loadPosition(size, moves, backend), args.depth)
+                nodes += n
+                elapsed += t
+            results[backend] = nodes / elapsed
+            print(f"{size}x{size} {backend:8} depth {args.depth}: {nodes} nodes in {elapsed:.2f}s"
+                  f" = {results[backend]:.0f} nodes/s")
+        # the backends list moves in different orders, so they search different node counts
+        print(f"{size}x{size} bitboard speedup: {results['bitboard'] / results['list']:.2f}x nodes/s")
+        for backend in ("list", "bitboard"):
+            game = loadPosition(size, positions[0], backend)
+            moves = game.getValidMoves()
+
+            def makeUndo():
+                for row, col in moves:
+                    game.makeMove(row, col, AlphaBetaAI)
+                    game.undoMove(row, col)
+
+            print(f"{size}x{size} {backend:8} makeMove+undoMove: {timeCalls(makeUndo, 200) * len(moves):.0f} pairs/s,"
+                  f" getValidMoves: {timeCalls(game.getValidMoves, 2000):.0f} calls/s,"
+                  f" checkWinner: {timeCalls(lambda: game.checkWinner(miniMaxAI), 2000):.0f} calls/s")
+
+
+def benchOrdering(args):
+    engines = {"alphaBeta": AlphaBetaAI, "minimax": miniMaxAI}
+    for size in args.sizes:
+        positions = [midgamePosition(size, args.stones, seed) for seed in range(args.positions)]
+        for name in args.engines:
+            depth = args.depth if engines[name] == AlphaBetaAI else min(args.depth, 2)
+            totals = {}
+            for ordering in ("set order", "threat order"):
+                nodes, elapsed = 0, 0.0
+                for moves in positions:
+                    orderer = MoveOrderer() if ordering == "threat order" else None
+                    n, t = timeSearch(loadPosition(size, moves, moveOrderer=orderer), depth, engines[name])
+                    nodes += n
+                    elapsed += t
+                totals[ordering] = nodes
+                print(f"{size}x{size} {name:9} depth {depth} {ordering:12}: {nodes} nodes in {elapsed:.2f}s")
+            print(f"{size}x{size} {name:9} node reduction: "
+                  f"{100 * (1 - totals['threat order'] / totals['set order']):.1f}%")
+
+
+# every pool searches the positions forwards and back, so a bound left over from a better
+# position would show up as a score that differs from the serial one, or a move that is not
+# worth its score
+def benchParallel(args):
+    positions = [midgamePosition(args.size, args.stones, seed) for seed in range(args.positions)]
+    positions += positions[::-1]
+    serial = [loadPosition(args.size, moves, candidateRadius=args.radius).alphaBeta(args.depth, True)[0]
+              for moves in positions]
+    baseline = None
+    failed = False
+    for workers in args.workers:
+        with ParallelSearch(workers, deterministic=args.deterministic) as search:
+            nodes, elapsed, wrong = 0, 0.0, 0
+            for moves, expected in zip(positions, serial):
+                game = loadPosition(args.size, moves, candidateRadius=args.radius)
+                start = time.perf_counter()
+                score, move = search.search(game, AlphaBetaAI, args.depth)
+                elapsed += time.perf_counter() - start
+                nodes += search.nodeCount
+                game.makeMove(*move, AlphaBetaAI)
+                if score != expected or game.alphaBeta(args.depth - 1, False)[0] != score:
+                    wrong += 1
+        failed = failed or wrong > 0
+        baseline = baseline or elapsed
+        print(f"{args.size}x{args.size} depth {args.depth} radius {args.radius} {workers:2} workers: {nodes} nodes"
+              f" in {elapsed:.2f}s"
+              f" = {nodes / elapsed:.0f} nodes/s, speedup {baseline / elapsed:.2f}x"
+              f"{f'  {wrong} WRONG' if wrong else ''}")
+    if failed:
+        sys.exit(1)
+
+
+def benchNumpy(args):
+    for size in args.sizes:
+        evaluator = NumpyEvaluator(size)
+        positions = [midgamePosition(size, args.stones, seed) for seed in range(args.positions)]
+        games = [loadPosition(size, moves) for moves in positions]
+        for game in games:
+            assert evaluator.evaluate(game.board, AlphaBetaAI) == game.evaluateFull(AlphaBetaAI)
+        game = games[0]
+        children = game.getValidMoves()
+        batch = evaluator.childBatch(game.board, children, AlphaBetaAI)
+        rates = {
+            "evaluateFull": timeCalls(lambda: game.evaluateFull(AlphaBetaAI), args.repeat),
+            "numpy single": timeCalls(lambda: evaluator.evaluate(game.board, AlphaBetaAI), args.repeat),
+            "numpy batch": timeCalls(lambda: evaluator.evaluateBatch(batch, AlphaBetaAI), args.repeat) * len(children),
+            "incremental": timeCalls(lambda: game.evaluate(AlphaBetaAI), args.repeat),
+        }
+        for name, rate in rates.items():
+            print(f"{size}x{size} {name:13}: {rate:12.0f} positions/s ({rate / rates['evaluateFull']:.1f}x evaluateFull)")
+        # both searches visit the same nodes, so only their wall times are compared
+        results = {}
+        for name, options in (("sequential", {}), ("batch leaves", {"batchEvaluator": evaluator})):
+            nodes, elapsed = 0, 0.0
+            for moves in positions:
+                n, t = timeSearch(loadPosition(size, moves, moveOrderer=MoveOrderer(), **options), args.depth)
+                nodes += n
+                elapsed += t
+            results[name] = nodes, elapsed
+        (nodes, sequential), (batchNodes, batch) = results["sequential"], results["batch leaves"]
+        print(f"{size}x{size} alphaBeta depth {args.depth}: sequential {sequential:.3f}s, batch leaves {batch:.3f}s"
+              f" ({sequential / batch:.2f}x), {nodes} nodes" +
+              ("" if batchNodes == nodes else f"  NODES DIFFER ({batchNodes} batched)"))
+
+
+# every opening position searched in all 8 orientations against one table, as rotated and
+# mirrored openings come up over many games
+def benchSymmetry(args):
+    for size in args.sizes:
+        cellMaps, _ = symmetryMaps(size)
+        positions = [midgamePosition(size, args.stones, seed) for seed in range(args.positions)]
+        for symmetric in (False, True):
+            table = TranspositionTable()
+            nodes, elapsed = 0, 0.0
+            for moves in positions:
+                for cells in cellMaps:
+                    turned = [(*divmod(cells[row * size + col], size), player) for row, col, player in moves]
+                    game = loadPosition(size, turned, transpositionTable=table, moveOrderer=MoveOrderer(),
+                                        symmetricTable=symmetric)
+                    n, t = timeSearch(game, args.depth)
+                    nodes += n
+                    elapsed += t
+            stats = table.stats()
+            print(f"{size}x{size} symmetricTable={symmetric!s:5}: {nodes} nodes in {elapsed:.2f}s,"
+                  f" table hit rate {stats['hitRate']:.1%}")
+
+
+# the cost of keeping each evaluator up to date and of searching with it; the pattern
+# tables are warmed on one search first, as they would be a few moves into a game
+def benchEvaluators(args):
+    for size in args.sizes:
+        positions = [midgamePosition(size, args.stones, seed) for seed in range(args.positions)]
+        for evaluator in evaluators:
+            timeSearch(loadPosition(size, positions[0], evaluator=evaluator, moveOrderer=MoveOrderer()), args.depth)
+            game = loadPosition(size, positions[0], evaluator=evaluator)
+            children = game.getValidMoves()
+
+            def makeAndUndo():
+                for move in children:
+                    game.makeMove(*move, AlphaBetaAI)
+                    game.undoMove(*move)
+            updates = timeCalls(makeAndUndo, args.repeat) * len(children)
+            nodes, elapsed = 0, 0.0
+            for moves in positions:
+                n, t = timeSearch(loadPosition(size, moves, evaluator=evaluator, moveOrderer=MoveOrderer()), args.depth)
+                nodes += n
+                elapsed += t
+            print(f"{size}x{size} {evaluator:7}: {updates:8.0f} make/undo per s, depth {args.depth}"
+                  f" {nodes} nodes in {elapsed:.2f}s = {nodes / elapsed:.0f} nodes/s")
+
+
+# alphaBeta and pvs on the corpus positions, at fixed depths and through iterative
+# deepening with aspiration windows; both must agree on every score
+def benchPvs(args):
+    corpus = loadCorpus(args.corpus)
+    for size in args.sizes:
+        for depth in args.depths:
+            for mode in ("fixed", "deepening"):
+                nodes, elapsed, scores = {}, {}, {}
+                for algorithm in searchAlgorithms:
+                    nodes[algorithm], elapsed[algorithm], scores[algorithm] = 0, 0.0, []
+                    for moves in corpus[size]:
+                        game = loadPosition(size, moves, seed=args.seed, searchAlgorithm=algorithm,
+                                            aspirationWindow=args.window, evaluator=args.evaluator,
+                                            transpositionTable=TranspositionTable(), moveOrderer=MoveOrderer())
+                        start = time.perf_counter()
+                        if mode == "fixed":
+                            score, _ = game.searchRoot(depth)
+                        else:
+                            score, _ = game.iterativeDeepening(AlphaBetaAI, 10 ** 9, depth)
+                        elapsed[algorithm] += time.perf_counter() - start
+                        nodes[algorithm] += game.nodeCount
+                        scores[algorithm].append(score)
+                assert scores["alphaBeta"] == scores["pvs"], (size, depth, mode, scores)
+                print(f"{size}x{size} depth {depth} {mode:9}: alphaBeta {nodes['alphaBeta']} nodes"
+                      f" in {elapsed['alphaBeta']:.2f}s, pvs {nodes['pvs']} nodes in {elapsed['pvs']:.2f}s"
+                      f" ({nodes['pvs'] / nodes['alphaBeta'] - 1:+.1%} nodes)")
+
+
+# time to depth of plain alphaBeta against pvs with each level of selective search, and
+# how often the selective search picks the move alphaBeta picks at its deepest depth
+def benchSelective(args):
+    corpus = loadCorpus(args.corpus)
+    failed = False
+    for size in args.sizes:
+        configurations = [("alphaBeta", {}, args.baseline_depths)] + \
+            [(level, {"searchAlgorithm": "pvs", "selectiveSearch": SelectiveSearch.level(level)}, args.depths)
+             for level in args.levels]
+        reference = None
+        for name, options, depths in configurations:
+            for depth in depths:
+                nodes, elapsed, moves = 0, 0.0, []
+                for position in corpus[size]:
+                    game = loadPosition(size, position, seed=args.seed, transpositionTable=TranspositionTable(),
+                                        moveOrderer=MoveOrderer(), **options)
+                    start = time.perf_counter()
+                    _, move = game.searchRoot(depth)
+                    elapsed += time.perf_counter() - start
+                    nodes += game.nodeCount
+                    moves.append(move)
+                line = f"{size}x{size} {name:10} depth {depth}: {nodes:7} nodes in {elapsed:6.2f}s"
+                if name == "alphaBeta":
+                    reference = moves
+                else:
+                    agree = sum(move == other for move, other in zip(moves, reference))
+                    line += f", same move as alphaBeta depth {args.baseline_depths[-1]} in {agree}/{len(moves)}"
+                print(line)
+        # a full-width pvs search on a table a selective one has filled must score as on a
+        # fresh table: the pruned entries are kept under keys of their own. The corpus
+        # positions happen not to show a difference, so random mid-game ones are used
+        positions = [midgamePosition(size, args.stones, seed) for seed in range(args.positions)]
+        for level in args.levels:
+            mixed = 0
+            for position in positions:
+                scores = []
+                for selective in (None, SelectiveSearch.level(level)):
+                    table = TranspositionTable()
+                    if selective is not None:
+                        loadPosition(size, position, seed=args.seed, searchAlgorithm="pvs", transpositionTable=table,
+                                     moveOrderer=MoveOrderer(), selectiveSearch=selective).searchRoot(args.depths[0])
+                    game = loadPosition(size, position, seed=args.seed, searchAlgorithm="pvs",
+                                        transpositionTable=table, moveOrderer=MoveOrderer())
+                    scores.append(game.searchRoot(args.depths[0])[0])
+                mixed += scores[0] != scores[1]
+            failed = failed or mixed > 0
+            print(f"{size}x{size} pvs depth {args.depths[0]} after {level}: {mixed}/{len(positions)}"
+                  f" scores changed by a shared table{'  MIXED' if mixed else ''}")
+    if failed:
+        sys.exit(1)
+
+
+# Peak heap of a search by depth, measured with tracemalloc. Each game searches its position
+# once at the deepest depth first, which sizes its per-ply move buffers; after that a
+# search of any depth should only hold the buffers it already has, so the peak stays flat
+# while the node count multiplies. The games have no transposition table, whose size is
+# fixed by maxEntries anyway and which would answer the repeated searches from memory.
+# Exits 1 when a deeper search peaks more than slack KB above the shallowest.
+def benchMemory(args):
+    corpus = loadCorpus(args.corpus)
+    failed = False
+    for size in args.sizes:
+        for algorithm in args.search:
+            peaks = {depth: 0 for depth in args.depths}
+            nodes = {depth: 0 for depth in args.depths}
+            for moves in corpus[size]:
+                game = loadPosition(size, moves, seed=args.seed, searchAlgorithm=algorithm,
+                                    evaluator=args.evaluator, moveOrderer=MoveOrderer())
+                game.searchRoot(max(args.depths))
+                tracemalloc.start()
+                try:
+                    for depth in args.depths:
+                        game.nodeCount = 0
+                        tracemalloc.reset_peak()
+                        start = tracemalloc.get_traced_memory()[0]
+                        game.searchRoot(depth)
+                        peaks[depth] = max(peaks[depth], tracemalloc.get_traced_memory()[1] - start)
+                        nodes[depth] += game.nodeCount
+                finally:
+                    tracemalloc.stop()
+            growth = peaks[max(args.depths)] - peaks[min(args.depths)]
+            flat = growth <= args.slack * 1024
+            failed = failed or not flat
+            print(f"{size}x{size} {algorithm:9}: " +
+                  ", ".join(f"depth {depth} {nodes[depth]} nodes {peaks[depth] / 1024:.1f} KB" for depth in args.depths) +
+                  f"{'' if flat else '  GROWS'}")
+    if failed:
+        sys.exit(1)
+
+
+engineNames = {mctsAI: "mcts", AlphaBetaAI: "alphaBeta"}
+
+
+# wall time of timed moves with the threat solver on: the solver, the search and the book
+# all share one timeLimitMs, so no move may run past it by more than the slack
+def benchBudget(args):
+    from GomokuThreats import ThreatSolver
+    corpus = loadCorpus(args.corpus)
+    names = {miniMaxAI: "minimax", AlphaBetaAI: "alphaBeta", mctsAI: "mcts"}
+    failed = False
+    for size in args.sizes:
+        for engine in (miniMaxAI, AlphaBetaAI, mctsAI):
+            worst = 0.0
+            for moves in corpus[size]:
+                game = loadPosition(size, moves, seed=args.seed, moveOrderer=MoveOrderer(),
+                                    threatSolver=ThreatSolver(timeLimitMs=args.solver_ms))
+                start = time.perf_counter()
+                game.findBestMove(engine, None, args.time_ms, PLAYER)
+                worst = max(worst, (time.perf_counter() - start) * 1000)
+            over = worst > args.time_ms + args.slack
+            failed = failed or over
+            print(f"{size}x{size} {names[engine]:9}: slowest move {worst:.0f} ms of {args.time_ms} ms"
+                  f"{'  OVER BUDGET' if over else ''}")
+    if failed:
+        sys.exit(1)
+
+
+# MCTS against alphaBeta from an opening book built for the run, so the first moves of both
+# come from the book as they do in the CLI and GUI
+def benchMcts(args):
+    from GomokuBook import generateBook, writeBook, OpeningBook
+    from GomokuMCTS import MonteCarloSearch
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"book{args.size}.bin")
+        writeBook(path, args.size, args.book_plies, generateBook(args.size, args.book_plies, 1, 8, args.seed))
+        with OpeningBook(path) as book:
+            for index in range(args.games):
+                monteCarlo = MonteCarloSearch(args.playouts, workers=args.workers, seed=args.seed + index)
+                game = Gomoku(args.size, moveOrderer=MoveOrderer(), openingBook=book, alphaBetaOpponent=mctsAI,
+                              candidateRadius=args.radius, monteCarlo=monteCarlo)
+                player = mctsAI if index % 2 == 0 else AlphaBetaAI
+                winner, bookMoves, playouts, elapsed = "draw", 0, 0, 0.0
+                while not game.isDraw():
+                    game.nodeCount = 0
+                    start = time.perf_counter()
+                    _, move = game.findBestMove(player, args.depth, None, AlphaBetaAI)
+                    if move is None:
+                        break
+                    if player == mctsAI:
+                        elapsed += time.perf_counter() - start
+                        playouts += game.nodeCount
+                        bookMoves += game.completedDepth == 0
+                    game.makeMove(*move, player)
+                    if game.isWinningMove(*move):
+                        winner = engineNames[player]
+                        break
+                    player = AlphaBetaAI if player == mctsAI else mctsAI
+                monteCarlo.close()
+                print(f"{args.size}x{args.size} game {index}: {winner} after {len(game.moveHistory)} plies,"
+                      f" mcts {bookMoves} book moves, {playouts / max(elapsed, 1e-9):.0f} playouts/s")
+
+
+corpusStones = {9: 10, 15: 14, 19: 18}
+
+
+def defaultCorpusPath():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus.json")
+
+
+def writeCorpus(args):
+    corpus = {str(size): [midgamePosition(size, corpusStones.get(size, 12), seed) for seed in range(args.positions)]
+              for size in args.sizes}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as out:
+        json.dump(corpus, out, indent=1)
+    print(f"wrote {sum(map(len, corpus.values()))} positions to {args.output}")
+
+
+def loadCorpus(path):
+    with open(path) as source:
+        return {int(size): [[tuple(move) for move in moves] for moves in positions]
+                for size, positions in json.load(source).items()}
+
+
+# The suite: every corpus position with a seeded game, so node counts repeat exactly from
+# run to run and only the times move. Each timing is taken rounds times and the best kept.
+# Calls are averaged over the positions of a size; searches add up their nodes and times,
+# the time to reach a depth being the time of a fixed-depth search from a fresh table.
+def runSuite(args):
+    corpus = loadCorpus(args.corpus)
+    # as timeit does, so a collection does not land in one timing and not the next
+    gcWasEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        results = {}
+        for size in args.sizes:
+            positions = corpus[size]
+            games = [loadPosition(size, moves, seed=args.seed, evaluator=args.evaluator) for moves in positions]
+            calls = {"evaluate": lambda game: game.evaluate(AlphaBetaAI),
+                     "checkWinner": lambda game: game.checkWinner(miniMaxAI),
+                     "getValidMoves": lambda game: game.getValidMoves()}
+            for name, call in calls.items():
+                rate = sum(max(timeCalls(lambda: call(game), args.calls) for _ in range(args.rounds))
+                           for game in games) / len(games)
+                results[f"{size}x{size} {name}"] = {"callsPerSec": round(rate)}
+            searches = [("alphaBeta", AlphaBetaAI, depth) for depth in args.alphabeta_depths] + \
+                       [("minimax", miniMaxAI, depth) for depth in args.minimax_depths]
+            for name, engine, depth in searches:
+                nodes, elapsed = 0, 0.0
+                for moves in positions:
+                    times = []
+                    for _ in range(args.rounds):
+                        game = loadPosition(size, moves, seed=args.seed, evaluator=args.evaluator,
+                                            transpositionTable=TranspositionTable(), moveOrderer=MoveOrderer())
+                        n, t = timeSearch(game, depth, engine)
+                        times.append(t)
+                    nodes += n
+                    elapsed += min(times)
+                results[f"{size}x{size} {name} depth {depth}"] = {"nodes": nodes, "seconds": round(elapsed, 4),
+                                                                    "nodesPerSec": round(nodes / elapsed)}
+            for name in results:
+                if name.startswith(f"{size}x{size} "):
+                    print(f"{name:28} " + ", ".join(f"{key} {value}" for key, value in results[name].items()))
+        report = {"meta": {"python": platform.python_version(), "machine": platform.machine(),
+                           "system": platform.system(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           "corpus": os.path.basename(args.corpus), "seed": args.seed, "evaluator": args.evaluator,
+                           "rounds": args.rounds},
+                  "results": results}
+    finally:
+        if gcWasEnabled:
+            gc.enable()
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as out:
+            json.dump(report, out, indent=1)
+        print(f"saved {len(results)} results to {args.save}")
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)
+        if compareReports(baseline["results"], results, args.tolerance):
+            sys.exit(1)
+
+
+# Prints the change of every shared result and returns the regressions: a rate more than
+# tolerance below the baseline or a time more than tolerance above it. A search whose node
+# count changed searched a different tree, so it is reported but its speed is not judged.
+def compareReports(baseline, current, tolerance):
+    regressions = []
+    for name in current:
+        if name not in baseline:
+            continue
+        old, new = baseline[name], current[name]
+        if "nodes" in new and new["nodes"] != old["nodes"]:
+            print(f"{name:28} nodes {old['nodes']} -> {new['nodes']}, search changed, not compared")
+            continue
+        for metric in ("callsPerSec", "nodesPerSec", "seconds"):
+            if metric not in new:
+                continue
+            change = new[metric] / old[metric] - 1 if old[metric] else 0.0
+            worse = change > tolerance if metric == "seconds" else change < -tolerance
+            if worse:
+                regressions.append((name, metric))
+            print(f"{name:28} {metric:12} {old[metric]:>12} -> {new[metric]:>12} {change:+7.1%}"
+                  f"{'  REGRESSION' if worse else ''}")
+    print(f"{len(regressions)} regressions beyond {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gomoku engine benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backends = commands.add_parser("backends", help="nodes per second of the list and bitboard boards")
+    backends.add_argument("--sizes", type=int, nargs="+", default=[15, 19])
+    backends.add_argument("--depth", type=int, default=3)
+    backends.add_argument("--stones", type=int, default=12)
+    backends.add_argument("--positions", type=int, default=3)
+    backends.set_defaults(run=benchBackends)
+
+    ordering = commands.add_parser("ordering", help="nodes searched with and without threat move ordering")
+    ordering.add_argument("--sizes", type=int, nargs="+", default=[9, 15])
+    ordering.add_argument("--engines", nargs="+", choices=["alphaBeta", "minimax"], default=["alphaBeta", "minimax"])
+    ordering.add_argument("--depth", type=int, default=3)
+    ordering.add_argument("--stones", type=int, default=12)
+    ordering.add_argument("--positions", type=int, default=3)
+    ordering.set_defaults(run=benchOrdering)
+
+    parallel = commands.add_parser("parallel", help="root-split alphaBeta scaling across worker processes")
+    parallel.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parallel.add_argument("--size", type=int, default=15)
+    parallel.add_argument("--depth", type=int, default=3)
+    parallel.add_argument("--stones", type=int, default=10)
+    parallel.add_argument("--positions", type=int, default=4)
+    parallel.add_argument("--radius", type=int, default=1, help="candidateRadius of the searched games")
+    parallel.add_argument("--deterministic", action="store_true")
+    parallel.set_defaults(run=benchParallel)
+
+    numpyBench = commands.add_parser("numpy", help="NumPy evaluator against evaluateFull, single and batched")
+    numpyBench.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    numpyBench.add_argument("--depth", type=int, default=3)
+    numpyBench.add_argument("--stones", type=int, default=12)
+    numpyBench.add_argument("--positions", type=int, default=3)
+    numpyBench.add_argument("--repeat", type=int, default=200)
+    numpyBench.set_defaults(run=benchNumpy)
+
+    symmetry = commands.add_parser("symmetry", help="table hit rate with and without symmetric keys")
+    symmetry.add_argument("--sizes", type=int, nargs="+", default=[9, 15])
+    symmetry.add_argument("--depth", type=int, default=3)
+    symmetry.add_argument("--stones", type=int, default=4)
+    symmetry.add_argument("--positions", type=int, default=3)
+    symmetry.set_defaults(run=benchSymmetry)
+
+    evaluatorBench = commands.add_parser("evaluators", help="update cost and search speed of the window and pattern evaluators")
+    evaluatorBench.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    evaluatorBench.add_argument("--depth", type=int, default=3)
+    evaluatorBench.add_argument("--stones", type=int, default=12)
+    evaluatorBench.add_argument("--positions", type=int, default=3)
+    evaluatorBench.add_argument("--repeat", type=int, default=200)
+    evaluatorBench.set_defaults(run=benchEvaluators)
+
+    pvs = commands.add_parser("pvs", help="nodes searched by alphaBeta and pvs on the corpus positions")
+    pvs.add_argument("--corpus", default=defaultCorpusPath())
+    pvs.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    pvs.add_argument("--depths", type=int, nargs="+", default=[3, 4])
+    pvs.add_argument("--window", type=int, default=500, help="aspiration window around the previous score")
+    pvs.add_argument("--evaluator", choices=evaluators, default="window")
+    pvs.add_argument("--seed", type=int, default=0)
+    pvs.set_defaults(run=benchPvs)
+
+    selective = commands.add_parser("selective", help="time to depth with late move reductions and beam pruning")
+    selective.add_argument("--corpus", default=defaultCorpusPath())
+    selective.add_argument("--sizes", type=int, nargs="+", default=[15, 19])
+    selective.add_argument("--levels", nargs="+", choices=sorted(selectiveLevels), default=["normal", "aggressive"])
+    selective.add_argument("--depths", type=int, nargs="+", default=[4, 5, 6])
+    selective.add_argument("--baseline-depths", type=int, nargs="+", default=[2, 3])
+    selective.add_argument("--stones", type=int, default=14, help="stones of the shared-table positions")
+    selective.add_argument("--positions", type=int, default=6, help="shared-table positions per size")
+    selective.add_argument("--seed", type=int, default=0)
+    selective.set_defaults(run=benchSelective)
+
+    memory = commands.add_parser("memory", help="tracemalloc peak of a search as the depth grows")
+    memory.add_argument("--corpus", default=defaultCorpusPath())
+    memory.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    memory.add_argument("--depths", type=int, nargs="+", default=[1, 2, 3, 4])
+    memory.add_argument("--search", nargs="+", choices=searchAlgorithms, default=list(searchAlgorithms))
+    memory.add_argument("--evaluator", choices=evaluators, default="window")
+    memory.add_argument("--slack", type=float, default=16, help="KB a deeper search may peak above the shallowest")
+    memory.add_argument("--seed", type=int, default=0)
+    memory.set_defaults(run=benchMemory)
+
+    mcts = commands.add_parser("mcts", help="MCTS against alphaBeta, both playing from an opening book")
+    mcts.add_argument("--size", type=int, default=9)
+    mcts.add_argument("--games", type=int, default=2)
+    mcts.add_argument("--playouts", type=int, default=300)
+    mcts.add_argument("--depth", type=int, default=2, help="alphaBeta depth")
+    mcts.add_argument("--book-plies", type=int, default=4)
+    mcts.add_argument("--radius", type=int, default=1, help="candidateRadius of the games")
+    mcts.add_argument("--workers", type=int, default=1, help="root-parallel processes of each MCTS search")
+    mcts.add_argument("--seed", type=int, default=0)
+    mcts.set_defaults(run=benchMcts)
+
+    budget = commands.add_parser("budget", help="wall time of timed moves with the threat solver on")
+    budget.add_argument("--corpus", default=defaultCorpusPath())
+    budget.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    budget.add_argument("--time-ms", type=int, default=100, help="timeLimitMs of each move")
+    budget.add_argument("--solver-ms", type=int, default=200, help="the threat solver's own time limit")
+    budget.add_argument("--slack", type=float, default=50, help="ms a move may run past its budget")
+    budget.add_argument("--seed", type=int, default=0)
+    budget.set_defaults(run=benchBudget)
+
+    corpus = commands.add_parser("corpus", help="write the fixed position corpus of the suite")
+    corpus.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    corpus.add_argument("--positions", type=int, default=4)
+    corpus.add_argument("--output", default=defaultCorpusPath())
+    corpus.set_defaults(run=writeCorpus)
+
+    suite = commands.add_parser("suite", help="the reproducible suite over the corpus, with baselines and compare")
+    suite.add_argument("--corpus", default=defaultCorpusPath())
+    suite.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19])
+    suite.add_argument("--alphabeta-depths", type=int, nargs="+", default=[1, 2, 3, 4])
+    suite.add_argument("--minimax-depths", type=int, nargs="+", default=[1, 2])
+    suite.add_argument("--evaluator", choices=evaluators, default="window")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--rounds", type=int, default=3, help="timings per measurement, the best is kept")
+    suite.add_argument("--calls", type=int, default=200, help="calls per timing of evaluate, checkWinner, getValidMoves")
+    suite.add_argument("--save", default=None, help="write the results as a JSON baseline")
+    suite.add_argument("--compare", default=None, help="baseline JSON to compare against; exits 1 on regressions")
+    suite.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown before a result is flagged")
+    suite.set_defaults(run=runSuite)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
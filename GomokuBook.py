@@ -0,0 +1,182 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+
+from GomokuGame import *
+
+
+headerFormat = struct.Struct("<4sBBHI")
+recordFormat = struct.Struct("<QH")
+keyFormat = struct.Struct("<Q")
+bookMagic = b"GMKB"
+bookVersion = 1
+
+
+# The book key of a position seen from the side to move: the mover's stones hash as PLAYER
+# and everyone else's as miniMaxAI, so the same shape is found whichever engine plays it.
+# Like Gomoku.canonicalHash, the key is the smallest of the 8 transformed hashes and comes
+# with the transform that gave it, to carry moves into and out of that orientation.
+def canonicalKey(game, player):
+    keys = [0] * len(game.symmetryMaps)
+    for row, col in game.moveHistory:
+        colour = PLAYER if game.cells[game.rowStart[row] + col] == player else miniMaxAI
+        keys = [h ^ k for h, k in zip(keys, game.symmetryKeys[row][col][colour])]
+    key = min(keys)
+    return key, keys.index(key)
+
+
+# A read-only opening book opened with mmap: a header and records sorted by key, so a
+# lookup is a binary search over the file without loading it.
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is not an opening book")
+        magic, version, self.boardSize, self.maxPlies, self.count = headerFormat.unpack_from(self.data, 0)
+        if magic != bookMagic or version != bookVersion:
+            self.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        return recordFormat.unpack_from(self.data, headerFormat.size + index * recordFormat.size)
+
+    def find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            midKey = keyFormat.unpack_from(self.data, headerFormat.size + mid * recordFormat.size)[0]
+            if midKey < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            found, move = self.record(lo)
+            if found == key:
+                return move
+        return None
+
+    # the book move for player in game's position, or None when the position is not in it
+    def lookup(self, game, player):
+        if game.boardSize != self.boardSize or len(game.moveHistory) >= self.maxPlies:
+            return None
+        key, transform = canonicalKey(game, player)
+        move = self.find(key)
+        if move is None:
+            return None
+        row, col = game.fromCanonical(divmod(move, self.boardSize), transform)
+        return (row, col) if game.isValidMove(row, col) else None
+
+
+def writeBook(path, boardSize, maxPlies, entries):
+    with open(path, "wb") as out:
+        out.write(headerFormat.pack(bookMagic, bookVersion, boardSize, maxPlies, len(entries)))
+        for key in sorted(entries):
+            out.write(recordFormat.pack(key, entries[key]))
+
+
+def defaultBookPath(boardSize):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "books", f"book{boardSize}.bin")
+
+
+# the book generated for this board size by "python GomokuBook.py generate", if there is one
+def loadBook(boardSize, path=None):
+    path = path or defaultBookPath(boardSize)
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+# the position with player's stones as AlphaBetaAI and the rest as miniMaxAI, ready for
+# alphaBeta to search from player's side
+def relabelled(game, player, seed=None):
+    copy = Gomoku(game.boardSize, transpositionTable=game.transpositionTable, moveOrderer=game.moveOrderer, seed=seed)
+    for row, col in game.moveHistory:
+        copy.makeMove(row, col, AlphaBetaAI if game.board[row][col] == player else miniMaxAI)
+    return copy
+
+
+# Self-play with the alphaBeta engine. Every position reached in the first plies of a game
+# gets the engine's move at depth; the game then follows that move, or with probability
+# deviation a random cell near the stones, so the book also covers replies the engine
+# would not play itself. The searches' fallback moves are seeded from the book's own
+# generator, so a seed gives the same book without touching the global random state.
+def generateBook(boardSize, plies, depth, games, seed=0, deviation=0.3, log=None):
+    rng = random.Random(seed)
+    entries = {}
+    table, orderer = TranspositionTable(), MoveOrderer()
+    for gameIndex in range(games):
+        game = Gomoku(boardSize, transpositionTable=table, moveOrderer=orderer)
+        player = AlphaBetaAI
+        for _ in range(plies):
+            key, transform = canonicalKey(game, player)
+            if key in entries:
+                move = game.fromCanonical(divmod(entries[key], boardSize), transform)
+            else:
+                _, move = relabelled(game, player, rng.getrandbits(64)).alphaBeta(depth, True)
+                row, col = game.toCanonical(move, transform)
+                entries[key] = row * boardSize + col
+            if rng.random() < deviation:
+                move = rng.choice(sorted(game.getValidMoves()) if game.moveHistory else
+                                  [(boardSize // 2 + dr, boardSize // 2 + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)])
+            game.makeMove(*move, player)
+            if game.isWinningMove(*move):
+                break
+            player = miniMaxAI if player == AlphaBetaAI else AlphaBetaAI
+        if log is not None:
+            log(gameIndex + 1, len(entries))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gomoku opening books")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="build a book by self-play")
+    generate.add_argument("--size", type=int, default=15)
+    generate.add_argument("--plies", type=int, default=6, help="positions are recorded for the first plies of each game")
+    generate.add_argument("--depth", type=int, default=2, help="alphaBeta depth for each book move")
+    generate.add_argument("--games", type=int, default=200)
+    generate.add_argument("--deviation", type=float, default=0.3, help="chance of a random move instead of the book move")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--output", default=None, help="book file (default books/book<size>.bin)")
+
+    info = commands.add_parser("info", help="print a book's header")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        path = args.output or defaultBookPath(args.size)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        start = time.perf_counter()
+        entries = generateBook(args.size, args.plies, args.depth, args.games, args.seed, args.deviation,
+                               lambda played, positions: print(f"\r{played}/{args.games} games,"
+                                                               f" {positions} positions", end="", flush=True))
+        writeBook(path, args.size, args.plies, entries)
+        print(f"\nwrote {len(entries)} positions to {path} in {time.perf_counter() - start:.1f}s")
+    else:
+        with OpeningBook(args.path) as book:
+            print(f"{book.boardSize}x{book.boardSize}, first {book.maxPlies} plies, {len(book)} positions,"
+                  f" {os.path.getsize(args.path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
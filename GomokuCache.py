@@ -0,0 +1,155 @@
+import math
+import os
+import struct
+import sys
+import threading
+from collections import OrderedDict
+
+from GomokuGame import *
+
+
+cacheHeader = struct.Struct("<4sBI")
+cacheRecord = struct.Struct("<QhdBH")
+cacheMagic = b"GMKC"
+cacheVersion = 1
+noMove = 0xFFFF
+
+
+# A search cache with the TranspositionTable interface (probe, store, clear, stats) that
+# lives as long as the process instead of one game, so a restarted or new game starts from
+# everything searched before. Keys already carry the board size through its Zobrist seed,
+# so one cache serves every size. Entries are kept in least-recently-used order and the
+# oldest go once the estimated memory passes maxBytes. A store only replaces an entry with
+# one at least as deep. save() writes the entries, oldest first, as fixed 21-byte records
+# and load() reads them back, so a warm cache survives restarts. The incremental evaluation
+# is a dictionary read already, so search results are the only thing worth caching.
+class SearchCache:
+    def __init__(self, maxBytes=64 << 20):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        sample = (1 << 63, 0, 0.0, exactBound, (18, 18))
+        # the entry tuple, its key, score and move, and the dict node that holds it
+        self.entryBytes = sys.getsizeof(sample) + sys.getsizeof(sample[0]) + sys.getsizeof(sample[2]) + \
+            sys.getsizeof(sample[4]) + 100
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.resize(maxBytes)
+
+    def resize(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.maxEntries = max(1, maxBytes // self.entryBytes)
+        with self.lock:
+            self.evict()
+
+    def evict(self):
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def probe(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    # entries are (key, depth, score, bound, bestMove), as in TranspositionTable
+    def store(self, key, depth, score, bound, bestMove):
+        with self.lock:
+            old = self.entries.get(key)
+            if old is None or depth >= old[1]:
+                self.entries[key] = (key, depth, score, bound, bestMove)
+            self.entries.move_to_end(key)
+            self.stores += 1
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.stores = self.evictions = 0
+
+    def memoryBytes(self):
+        return len(self.entries) * self.entryBytes
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "capacity": self.maxEntries,
+            "memoryBytes": self.memoryBytes(),
+            "maxBytes": self.maxBytes,
+        }
+
+    def save(self, path):
+        with self.lock:
+            entries = list(self.entries.values())
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        partial = path + ".partial"
+        with open(partial, "wb") as out:
+            out.write(cacheHeader.pack(cacheMagic, cacheVersion, len(entries)))
+            for key, depth, score, bound, bestMove in entries:
+                move = noMove if bestMove is None else bestMove[0] << 8 | bestMove[1]
+                out.write(cacheRecord.pack(key, depth, score, bound, move))
+        os.replace(partial, path)
+        return len(entries)
+
+    # adds the saved entries as the least recently used ones, keeping any deeper entry
+    # already in the cache
+    def load(self, path):
+        with open(path, "rb") as source:
+            data = source.read()
+        magic, version, count = cacheHeader.unpack_from(data, 0)
+        if magic != cacheMagic or version != cacheVersion:
+            raise ValueError(f"{path} is not a search cache")
+        with self.lock:
+            loaded = OrderedDict()
+            for key, depth, score, bound, move in cacheRecord.iter_unpack(
+                    data[cacheHeader.size:cacheHeader.size + count * cacheRecord.size]):
+                if score not in (math.inf, -math.inf):
+                    score = int(score)
+                loaded[key] = (key, depth, score, bound, None if move == noMove else (move >> 8, move & 0xFF))
+            for key, entry in self.entries.items():
+                if key not in loaded or entry[1] >= loaded[key][1]:
+                    loaded[key] = entry
+                loaded.move_to_end(key)
+            self.entries = loaded
+            self.evict()
+        return count
+
+
+processCache = None
+
+
+def defaultCachePath():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "caches", "search.cache")
+
+
+# the one SearchCache of this process, created on first use
+def sharedCache(maxBytes=64 << 20):
+    global processCache
+    if processCache is None:
+        processCache = SearchCache(maxBytes)
+    return processCache
+
+
+# sharedCache(), warmed from path (the default snapshot when not given) if that file exists
+def loadSharedCache(path=None, maxBytes=64 << 20):
+    cache = sharedCache(maxBytes)
+    path = path or defaultCachePath()
+    if os.path.exists(path):
+        try:
+            cache.load(path)
+        except (ValueError, struct.error):
+            pass
+    return cache
@@ -1,5 +1,10 @@
 import customtkinter as ctk
 from GomokuGame import *
+from GomokuThreats import ThreatSolver
+from GomokuBook import loadBook
+from GomokuPonder import Ponderer
+from GomokuCache import loadSharedCache, sharedCache, defaultCachePath
+from GomokuMCTS import MonteCarloSearch
 import threading
 import winsound
 import time
@@ -48,6 +53,8 @@ class App(ctk.CTk):
         super().__init__()
         self.title("Gomoku")
         self.geometry("1000x700")
+        loadSharedCache()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.container = ctk.CTkFrame(self)
         self.container.pack(fill="both", expand=True)
@@ -61,19 +68,27 @@ class App(ctk.CTk):
 
         self.show_frame("HomePage")
 
+    # keeps the searched positions for the next session
+    def on_close(self):
+        sharedCache().save(defaultCachePath())
+        self.destroy()
+
     def show_frame(self, page_name):
         frame = self.frames[page_name]
         frame.tkraise()
 
-    def start_game(self, page_name, board_size, depth_limit):
+    def start_game(self, page_name, board_size, depth_limit, time_limit=0, ponder=False, engine=miniMaxAI,
+                   playouts=1000):
         if page_name in self.frames:
             self.frames[page_name].destroy()
             del self.frames[page_name]
 
         if page_name == "PageOne":
-            new_frame = PageOne(parent=self.container, controller=self, board_size=board_size, depth_limit=depth_limit)
+            new_frame = PageOne(parent=self.container, controller=self, board_size=board_size, depth_limit=depth_limit,
+                                time_limit=time_limit, ponder=ponder, engine=engine, playouts=playouts)
         elif page_name == "PageTwo":
-            new_frame = PageTwo(parent=self.container, controller=self, board_size=board_size, depth_limit=depth_limit)
+            new_frame = PageTwo(parent=self.container, controller=self, board_size=board_size, depth_limit=depth_limit,
+                                time_limit=time_limit, first=engine, playouts=playouts)
         else:
             raise ValueError(f"Unknown page_name: {page_name}")
 
@@ -96,7 +111,7 @@ class HomePage(ctk.CTkFrame):
 
         section_width = 450
 
-        section1_frame = ctk.CTkFrame(main_frame, corner_radius=15, width=section_width, height=120)
+        section1_frame = ctk.CTkFrame(main_frame, corner_radius=15, width=section_width, height=280)
         section1_frame.pack(pady=20)
         section1_frame.pack_propagate(False)
 
@@ -127,29 +142,90 @@ class HomePage(ctk.CTkFrame):
         self.depth_entry.grid(row=1, column=1, padx=10, pady=10)
         self.depth_entry.insert(0, "2")
 
-        section2_frame = ctk.CTkFrame(main_frame, corner_radius=15, width=section_width, height=180)
+        ctk.CTkLabel(section1_inner, text="Time (ms)   ", font=("Anta", 24)).grid(
+            row=2, column=0, padx=10, pady=10, sticky="e"
+        )
+        self.time_entry = ctk.CTkEntry(
+            section1_inner,
+            width=120,
+            font=("Anta", 24),
+            placeholder_text="0 = depth"
+        )
+        self.time_entry.grid(row=2, column=1, padx=10, pady=10)
+        self.time_entry.insert(0, "0")
+
+        ctk.CTkLabel(section1_inner, text="MCTS Playouts", font=("Anta", 24)).grid(
+            row=3, column=0, padx=10, pady=10, sticky="e"
+        )
+        self.playouts_entry = ctk.CTkEntry(
+            section1_inner,
+            width=120,
+            font=("Anta", 24),
+            placeholder_text=">= 1"
+        )
+        self.playouts_entry.grid(row=3, column=1, padx=10, pady=10)
+        self.playouts_entry.insert(0, "1000")
+
+        self.ponder_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            section1_inner,
+            text="Ponder on your time",
+            font=("Anta", 20),
+            variable=self.ponder_var
+        ).grid(row=4, column=0, columnspan=2, padx=10, pady=10)
+
+        section2_frame = ctk.CTkFrame(main_frame, corner_radius=15, width=section_width * 3 // 2, height=160)
         section2_frame.pack(pady=10)
         section2_frame.pack_propagate(False)
 
+        section2_inner = ctk.CTkFrame(section2_frame, fg_color="transparent")
+        section2_inner.pack(expand=True)
+
         btn1 = ctk.CTkButton(
-            section2_frame, text="Human VS MiniMax",
-            font=("Pixelify Sans SemiBold", 28), corner_radius=10,
+            section2_inner, text="Human VS MiniMax",
+            font=("Pixelify Sans SemiBold", 24), corner_radius=10,
             fg_color="#1467C2",
             hover_color="#003DA6",
-            width=350, height=60,
-            command=lambda: controller.start_game("PageOne", self.get_board_size(), self.get_depth())
+            width=300, height=60,
+            command=lambda: controller.start_game("PageOne", self.get_board_size(), self.get_depth(),
+                                             self.get_time_limit(), self.ponder_var.get())
         )
-        btn1.pack(pady=(20, 10), anchor="center")
+        btn1.grid(row=0, column=0, padx=10, pady=(0, 10))
 
         btn2 = ctk.CTkButton(
-            section2_frame, text="MiniMax VS Alpha-Beta",
-            font=("Pixelify Sans SemiBold", 28), corner_radius=10,
+            section2_inner, text="MiniMax VS Alpha-Beta",
+            font=("Pixelify Sans SemiBold", 24), corner_radius=10,
+            fg_color="#1467C2",
+            hover_color="#003DA6",
+            width=300, height=60,
+            command=lambda: controller.start_game("PageTwo", self.get_board_size(), self.get_depth(),
+                                             self.get_time_limit())
+        )
+        btn2.grid(row=1, column=0, padx=10)
+
+        btn3 = ctk.CTkButton(
+            section2_inner, text="Human VS MCTS",
+            font=("Pixelify Sans SemiBold", 24), corner_radius=10,
+            fg_color="#1467C2",
+            hover_color="#003DA6",
+            width=300, height=60,
+            command=lambda: controller.start_game("PageOne", self.get_board_size(), self.get_depth(),
+                                             self.get_time_limit(), engine=mctsAI,
+                                             playouts=self.get_playouts())
+        )
+        btn3.grid(row=0, column=1, padx=10, pady=(0, 10))
+
+        btn4 = ctk.CTkButton(
+            section2_inner, text="MCTS VS Alpha-Beta",
+            font=("Pixelify Sans SemiBold", 24), corner_radius=10,
             fg_color="#1467C2",
             hover_color="#003DA6",
-            width=350, height=60,
-            command=lambda: controller.start_game("PageTwo", self.get_board_size(), self.get_depth())
+            width=300, height=60,
+            command=lambda: controller.start_game("PageTwo", self.get_board_size(), self.get_depth(),
+                                             self.get_time_limit(), engine=mctsAI,
+                                             playouts=self.get_playouts())
         )
-        btn2.pack(pady=(0, 20), anchor="center")
+        btn4.grid(row=1, column=1, padx=10)
 
     def get_board_size(self):
         try:
@@ -171,15 +247,39 @@ class HomePage(ctk.CTkFrame):
             d = 2
         return d
 
-# Human VS MiniMax
+    def get_time_limit(self):
+        try:
+            t = int(self.time_entry.get())
+            if t < 0:
+                t = 0
+        except ValueError:
+            t = 0
+        return t
+
+    def get_playouts(self):
+        try:
+            n = int(self.playouts_entry.get())
+            if n < 1:
+                n = 1
+        except ValueError:
+            n = 1000
+        return n
+
+# Human VS MiniMax or MCTS; MCTS keeps its tree between moves instead of pondering
 class PageOne(ctk.CTkFrame):
-    def __init__(self, parent, controller, board_size=6, cell_size=40, depth_limit=2):
+    def __init__(self, parent, controller, board_size=6, cell_size=40, depth_limit=2, time_limit=0, ponder=False,
+                 engine=miniMaxAI, playouts=1000):
         super().__init__(parent)
         self.controller = controller
         self.board_size = board_size
         self.cell_size = cell_size
         self.depth_limit = depth_limit
+        self.time_limit = time_limit
+        self.engine = engine
         self.canvas_size = (board_size - 1) * cell_size + 2 * cell_size
+        self.ponderer = Ponderer(engine, depth_limit, time_limit) if ponder and engine == miniMaxAI else None
+        self.monte_carlo = MonteCarloSearch(playouts) if engine == mctsAI else None
+        self.search_control = None
 
         self.active = True
 
@@ -199,7 +299,11 @@ class PageOne(ctk.CTkFrame):
         btn_container = ctk.CTkFrame(self, fg_color="transparent")
         btn_container.pack(pady=20)
 
-        self.gomoku = Gomoku(board_size)
+        self.stats = SearchStats()
+        self.book = loadBook(board_size)
+        self.gomoku = Gomoku(board_size, transpositionTable=sharedCache(),
+                             moveOrderer=MoveOrderer(), stats=self.stats,
+                             threatSolver=ThreatSolver(), openingBook=self.book, monteCarlo=self.monte_carlo)
         self.turn = PLAYER
 
         self.canvas = ctk.CTkCanvas(
@@ -241,10 +345,18 @@ class PageOne(ctk.CTkFrame):
         )
         restart_button.pack(side="left", padx=10)
 
+        self.stats_label = ctk.CTkLabel(self, text="", font=("Anta", 14))
+        self.stats_label.pack(pady=(0, 10))
+
     def restart_game(self):
+        self.cancel_search()
         self.active = True
 
-        self.gomoku = Gomoku(self.board_size)
+        self.stats = SearchStats()
+        self.gomoku = Gomoku(self.board_size, transpositionTable=sharedCache(),
+                             moveOrderer=MoveOrderer(), stats=self.stats,
+                             threatSolver=ThreatSolver(), openingBook=self.book, monteCarlo=self.monte_carlo)
+        self.stats_label.configure(text="")
         self.turn = PLAYER
 
         self.canvas.delete("pieces")
@@ -256,10 +368,23 @@ class PageOne(ctk.CTkFrame):
         self.canvas.bind("<Button-1>", self.on_click)
 
     def on_back(self):
+        self.cancel_search()
         self.active = False
         self.canvas.unbind("<Button-1>")
         self.controller.show_frame("HomePage")
 
+    def cancel_search(self):
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self.search_control is not None:
+            self.search_control.cancel()
+
+    def show_progress(self, progress):
+        text = f"Thinking... depth {progress['depth']}, {progress['nodes']} nodes, {progress['elapsedMs']} ms"
+        if progress["move"] is not None:
+            text += f", best {progress['move']}"
+        self.after(0, lambda: self.stats_label.configure(text=text))
+
     def draw_grid(self):
         self.canvas.delete("grid")
         for i in range(self.board_size):
@@ -281,7 +406,7 @@ class PageOne(ctk.CTkFrame):
                 val = self.gomoku.board[y][x]
                 if val == PLAYER:
                     self.draw_piece(x, y, "black")
-                elif val == miniMaxAI:
+                elif val == self.engine:
                     self.draw_piece(x, y, "white")
 
     def on_click(self, event):
@@ -303,7 +428,7 @@ class PageOne(ctk.CTkFrame):
                     self.turn = None
                     return
 
-                self.turn = miniMaxAI
+                self.turn = self.engine
                 threading.Thread(target=self.ai_move, daemon=True).start()
 
 
@@ -311,15 +436,36 @@ class PageOne(ctk.CTkFrame):
         if not self.active:
             return
 
-        _ , movee = self.gomoku.minimax(depth=0, isMaximizing=True, depthLimit=self.depth_limit)
+        pondered = None
+        if self.ponderer is not None:
+            self.ponderer.stop(wait=True)
+            pondered = self.ponderer.lookup(self.gomoku)
+        if pondered is not None:
+            _ , movee = pondered
+        else:
+            self.search_control = SearchControl(onProgress=self.show_progress)
+            self.after(0, lambda: self.stats_label.configure(text="Thinking..."))
+            try:
+                _ , movee = self.gomoku.findBestMove(self.engine, self.depth_limit, self.time_limit,
+                                                     control=self.search_control)
+            except SearchCancelled:
+                return
 
         if not self.active:
             return
 
+        if pondered is not None:
+            summary = "Answered from pondering"
+        elif self.monte_carlo is not None:
+            summary = self.monte_carlo.summary()
+        else:
+            summary = self.stats.summary()
+        self.after(0, lambda: self.stats_label.configure(text=summary))
+
         if movee:
-            self.gomoku.makeMove(movee[0], movee[1], miniMaxAI)
+            self.gomoku.makeMove(movee[0], movee[1], self.engine)
         self.draw_all_pieces()
-        if self.gomoku.checkWinner(miniMaxAI):
+        if self.gomoku.checkWinner(self.engine):
             self.after(0, lambda: CustomAlert(self, "Game Over", "AI wins!"))
             self.turn = None
             return
@@ -327,20 +473,30 @@ class PageOne(ctk.CTkFrame):
             self.after(0, lambda: CustomAlert(self, "Game Over", "Draw!"))
             self.turn = None
             return
+        # the ponderer copies the position before a click can change it
+        if self.ponderer is not None and self.active:
+            self.ponderer.start(self.gomoku)
         self.turn = PLAYER
 
-# MiniMax vs AlphaBeta
+# MiniMax or MCTS (black) vs AlphaBeta (white)
 class PageTwo(ctk.CTkFrame):
-    def __init__(self, parent, controller, board_size=6, cell_size=40, depth_limit=2):
+    def __init__(self, parent, controller, board_size=6, cell_size=40, depth_limit=2, time_limit=0, first=miniMaxAI,
+                 playouts=1000):
         super().__init__(parent)
         self.current_ai = None
+        self.first = first
+        self.first_name = "Minimax AI" if first == miniMaxAI else "MCTS AI"
+        self.monte_carlo = MonteCarloSearch(playouts) if first == mctsAI else None
 
         self.controller = controller
         self.board_size = board_size
         self.cell_size = cell_size
         self.depth_limit = depth_limit
+        self.time_limit = time_limit
         self.canvas_size = (board_size - 1) * cell_size + 2 * cell_size
 
+        self.book = loadBook(board_size)
+        self.search_control = None
         self.run_id = 0
         self._start_new_game()
 
@@ -397,12 +553,20 @@ class PageTwo(ctk.CTkFrame):
         )
         restart_button.pack(side="left", padx=10)
 
+        self.stats_label = ctk.CTkLabel(self, text="", font=("Anta", 14))
+        self.stats_label.pack(pady=(0, 10))
+
         threading.Thread(target=self.ai_vs_ai_loop, args=(self.run_id,), daemon=True).start()
 
     def _start_new_game(self):
+        self.cancel_search()
         self.run_id += 1
-        self.gomoku = Gomoku(self.board_size)
-        self.current_ai = miniMaxAI
+        self.stats = SearchStats()
+        self.gomoku = Gomoku(self.board_size, transpositionTable=sharedCache(),
+                             moveOrderer=MoveOrderer(), stats=self.stats,
+                             threatSolver=ThreatSolver(), openingBook=self.book, alphaBetaOpponent=self.first,
+                             monteCarlo=self.monte_carlo)
+        self.current_ai = self.first
 
     def restart_game(self):
         self._start_new_game()
@@ -415,9 +579,20 @@ class PageTwo(ctk.CTkFrame):
         threading.Thread(target=self.ai_vs_ai_loop, args=(self.run_id,), daemon=True).start()
 
     def on_back(self):
+        self.cancel_search()
         self.run_id += 1
         self.controller.show_frame("HomePage")
 
+    def cancel_search(self):
+        if self.search_control is not None:
+            self.search_control.cancel()
+
+    def show_progress(self, tagg, progress):
+        text = f"{tagg} thinking... depth {progress['depth']}, {progress['nodes']} nodes, {progress['elapsedMs']} ms"
+        if progress["move"] is not None:
+            text += f", best {progress['move']}"
+        self.after(0, lambda: self.stats_label.configure(text=text))
+
     def draw_grid(self):
         self.canvas.delete("grid")
         for i in range(self.board_size):
@@ -440,7 +615,7 @@ class PageTwo(ctk.CTkFrame):
         for y in range(self.board_size):
             for x in range(self.board_size):
                 val = self.gomoku.board[y][x]
-                if val == miniMaxAI:
+                if val == self.first:
                     self.draw_piece(x, y, "black")
                 elif val == AlphaBetaAI:
                     self.draw_piece(x, y, "white")
@@ -451,18 +626,27 @@ class PageTwo(ctk.CTkFrame):
                 self.after(0, lambda: CustomAlert(self, "Game Over", "Draw!"))
                 break
 
-            if self.current_ai == miniMaxAI:
-                _, movee = self.gomoku.minimax(0, True, self.depth_limit)
-                ai_player = miniMaxAI
-                tagg = "Minimax AI"
+            if self.current_ai == self.first:
+                ai_player, opponent, tagg = self.first, AlphaBetaAI, self.first_name
             else:
-                _, movee = self.gomoku.alphaBeta(self.depth_limit, True)
-                ai_player = AlphaBetaAI
-                tagg = "AlphaBeta AI"
+                ai_player, opponent, tagg = AlphaBetaAI, self.first, "AlphaBeta AI"
+            control = SearchControl(onProgress=lambda progress, tagg=tagg: self.show_progress(tagg, progress))
+            self.search_control = control
+            try:
+                _, movee = self.gomoku.findBestMove(ai_player, self.depth_limit, self.time_limit, opponent,
+                                                    control)
+            except SearchCancelled:
+                break
 
             if self.run_id != run_id:
                 break
 
+            if ai_player == mctsAI:
+                summary = f"{tagg}: {self.monte_carlo.summary()}"
+            else:
+                summary = f"{tagg}: {self.stats.summary()}"
+            self.after(0, lambda: self.stats_label.configure(text=summary))
+
             if movee:
                 self.gomoku.makeMove(movee[0], movee[1], ai_player)
                 self.after(0, self.draw_all_pieces)
@@ -470,7 +654,7 @@ class PageTwo(ctk.CTkFrame):
                     self.after(0, lambda: CustomAlert(self, "Game Over", f"{tagg} wins!"))
                     break
 
-            self.current_ai = AlphaBetaAI if self.current_ai == miniMaxAI else miniMaxAI
+            self.current_ai = AlphaBetaAI if self.current_ai == self.first else self.first
             time.sleep(0.5)
 
 if __name__ == "__main__":
@@ -1,18 +1,790 @@
+import json
 import math
 import random
+import threading
+import time
+from itertools import repeat
+from operator import xor
 
 
 emptyCell = 0
 PLAYER = 1
 miniMaxAI = 2
 AlphaBetaAI = 3
+mctsAI = 4
+# every stone colour; the incremental evaluation keeps scores for the first three, the
+# players the tree searches evaluate for
+stoneColors = (PLAYER, miniMaxAI, AlphaBetaAI, mctsAI)
+
+windowWeights = {1: 10, 2: 100, 3: 1000, 4: 10000}
+lineDirections = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+# score of every window content for each player, matching the scan in evaluateFull;
+# a window of length L is encoded in base 5 with cell i as digit i
+def buildWindowScores(winCondition=5):
+    tables = {}
+    for player in (PLAYER, miniMaxAI, AlphaBetaAI):
+        byLength = [None]
+        for length in range(1, winCondition + 1):
+            scores = []
+            for code in range(5 ** length):
+                score = 0
+                cntMax, cntOpp = 0, 0
+                for i in range(length):
+                    cell = code // 5 ** i % 5
+                    if cell == player:
+                        cntMax += 1
+                    elif cell != emptyCell:
+                        cntOpp += 1
+                    else:
+                        if cntMax > 0 and cntOpp == 0:
+                            score += windowWeights.get(cntMax, 0)
+                        elif cntOpp > 0 and cntMax == 0:
+                            score -= windowWeights.get(cntOpp, 0)
+                scores.append(score)
+            byLength.append(scores)
+        tables[player] = byLength
+    return tables
+
+
+windowScores = buildWindowScores()
+
+# Shapes of the pattern evaluator, weakest first, and what each is worth. A four has one
+# cell that makes five and an open four two; a three is one move from a four and an open
+# three one move from an open four, and so on down to a lone stone.
+shapeNames = ("none", "one", "two", "openTwo", "three", "openThree", "four", "openFour", "five")
+shapeWeights = (0, 10, 100, 500, 1000, 8000, 10000, 100000, 1000000)
+noShape, oneShape, fiveShape, fourShape, openFourShape = 0, 1, 8, 6, 7
+# the shape a stone group has when its best move makes the given shape
+shapeBelow = (0, 1, 1, 1, 2, 3, 4, 5)
+shapeLevels = {}
+
+
+# The shape of the stones in mask (bit i = cell i) on an empty stretch of length cells
+# with no opponent stone in it. Built bottom up from the shapes one stone further on;
+# every stretch up to 9 cells, a lone stone with the 4 cells on each side, is filled in
+# at import and longer ones on first use.
+def shapeLevel(length, mask):
+    level = shapeLevels.get((length, mask))
+    if level is not None:
+        return level
+    if mask == 0:
+        level = noShape
+    elif any((mask >> i) & 31 == 31 for i in range(length - 4)):
+        level = fiveShape
+    else:
+        wins, best = 0, noShape
+        for i in range(length):
+            if not mask >> i & 1:
+                child = shapeLevel(length, mask | 1 << i)
+                if child == fiveShape:
+                    wins += 1
+                elif child > best:
+                    best = child
+        level = openFourShape if wins >= 2 else fourShape if wins else shapeBelow[best]
+    shapeLevels[(length, mask)] = level
+    return level
+
+
+for length in range(5, 10):
+    for mask in range(1 << length):
+        shapeLevel(length, mask)
+
+
+# The shapes of player's stones on one line of cells, as the sum of their weights. Any
+# other stone or the board edge splits the line into stretches, and stretches shorter than
+# five cells are dead. Inside a stretch, stones more than 4 cells apart can never share a
+# five, so each group of closer stones is scored on its own with the 4 cells around it.
+def lineShapeScore(cells, player):
+    score = 0
+    start = 0
+    for end in range(len(cells) + 1):
+        if end < len(cells) and (cells[end] == emptyCell or cells[end] == player):
+            continue
+        stones = [i for i in range(start, end) if cells[i] == player]
+        if end - start >= 5 and stones:
+            first = previous = stones[0]
+            for i in stones[1:] + [math.inf]:
+                if i - previous > 4:
+                    low, high = max(start, first - 4), min(end, previous + 5)
+                    mask = 0
+                    for stone in stones:
+                        if first <= stone <= previous:
+                            mask |= 1 << (stone - low)
+                    score += shapeWeights[shapeLevel(high - low, mask)]
+                    first = i
+                previous = i
+        start = end + 1
+    return score
+
+
+patternCacheLimit = 1 << 18
+
+
+# A line's score for one player, looked up by the line's code (cell i as base-5 digit i,
+# as for windows). A missing code is scored for every stone colour at once, from each
+# one's own shapes minus everyone else's, so later lookups of the line are a dict read.
+class PatternScores(dict):
+    def __init__(self, lines, player):
+        super().__init__()
+        self.lines = lines
+        self.player = player
+
+    def __missing__(self, code):
+        self.lines.score(code)
+        return self[code]
+
+
+class LinePatterns:
+    def __init__(self, length):
+        self.length = length
+        self.tables = tuple(PatternScores(self, player) for player in stoneColors)
+
+    def score(self, code):
+        cells = [code // 5 ** i % 5 for i in range(self.length)]
+        shapes = [lineShapeScore(cells, table.player) for table in self.tables]
+        total = sum(shapes)
+        for table, own in zip(self.tables, shapes):
+            if len(table) >= patternCacheLimit:
+                table.clear()
+            table[code] = 2 * own - total
+
+
+linePatterns = {}
+
+
+# the per-player score tables for lines of this length, shared by every game
+def patternTables(length):
+    if length not in linePatterns:
+        linePatterns[length] = LinePatterns(length)
+    return linePatterns[length].tables
+
+
+# The 8 symmetries of the square board as flat cell index maps: cellMaps[t][r * N + c] is
+# where (r, c) lands under transform t, inverseMaps[t] maps it back. Transform 0 is the
+# identity.
+def symmetryMaps(boardSize):
+    last = boardSize - 1
+    cellMaps = []
+    for mirror in (False, True):
+        for turns in range(4):
+            cells = []
+            for row in range(boardSize):
+                for col in range(boardSize):
+                    r, c = row, (last - col if mirror else col)
+                    for _ in range(turns):
+                        r, c = c, last - r
+                    cells.append(r * boardSize + c)
+            cellMaps.append(cells)
+    inverseMaps = []
+    for cells in cellMaps:
+        inverse = [0] * len(cells)
+        for cell, image in enumerate(cells):
+            inverse[image] = cell
+        inverseMaps.append(inverse)
+    return cellMaps, inverseMaps
+
+
+# marks the padding around the board; it is no player and not empty, so runs and scans stop
+# on it without bounds checks
+borderCell = 5
+
+
+# The board as one flat bytearray with pad cells of borderCell on every side: (row, col) is
+# cells[(row + pad) * stride + col + pad]. board[row] is a writable memoryview of that row,
+# so board[row][col] still reads and writes like the old list of lists.
+class Board:
+    __slots__ = ("size", "pad", "stride", "cells", "view")
+
+    def __init__(self, size, pad=1):
+        self.size = size
+        self.pad = pad
+        self.stride = size + 2 * pad
+        self.cells = bytearray([borderCell]) * (self.stride * self.stride)
+        for row in range(size):
+            start = self.index(row, 0)
+            self.cells[start:start + size] = bytes(size)
+        self.view = memoryview(self.cells)
+
+    def index(self, row, col):
+        return (row + self.pad) * self.stride + col + self.pad
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise IndexError("board row out of range")
+        start = self.index(row, 0)
+        return self.view[start:start + self.size]
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (self[row] for row in range(self.size))
+
+    def count(self, cell):
+        return self.cells.count(cell)
+
+    # the cells without padding, row by row
+    def interior(self):
+        return b"".join(self[row] for row in range(self.size))
+
+    def snapshot(self):
+        return bytes(self.cells)
+
+    def restore(self, snapshot):
+        self.cells[:] = snapshot
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchCancelled(SearchTimeout):
+    pass
+
+
+# Steers a running search from outside: cancel() from any thread stops it with
+# SearchCancelled, a deadline stops it with SearchTimeout, and onProgress, if given, is
+# called with the current depth, best move, score and node count whenever a depth or a root
+# move improves and at most every progressIntervalMs in between. The search only looks at
+# it every pollInterval nodes.
+class SearchControl:
+    def __init__(self, deadline=None, onProgress=None, pollInterval=256, progressIntervalMs=100):
+        self.cancelled = threading.Event()
+        self.deadline = deadline
+        self.onProgress = onProgress
+        self.pollInterval = pollInterval
+        self.progressInterval = progressIntervalMs / 1000
+        self.start = time.perf_counter()
+        self.nextProgress = self.start
+        self.rootDepth = None
+        self.depth = 0
+        self.bestMove = None
+        self.score = None
+        self.nodes = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def poll(self, nodes):
+        if self.cancelled.is_set():
+            raise SearchCancelled
+        now = time.perf_counter()
+        if self.deadline is not None and now >= self.deadline:
+            raise SearchTimeout
+        self.nodes = nodes
+        if self.onProgress is not None and now >= self.nextProgress:
+            self.report()
+
+    def update(self, depth, bestMove, score, nodes):
+        self.depth, self.bestMove, self.score, self.nodes = depth, bestMove, score, nodes
+        if self.onProgress is not None:
+            self.report()
+
+    def report(self):
+        now = time.perf_counter()
+        self.nextProgress = now + self.progressInterval
+        self.onProgress({"depth": self.depth, "move": self.bestMove, "score": self.score, "nodes": self.nodes,
+                         "elapsedMs": round((now - self.start) * 1000)})
+
+
+exactBound = 0
+lowerBound = 1
+upperBound = 2
+
+
+# Fixed-size table of two-slot buckets: the first slot keeps the deepest result seen for
+# its bucket, the second always takes the newest one, so shallow entries never push out
+# expensive deep ones and the table never grows past maxEntries.
+class TranspositionTable:
+    def __init__(self, maxEntries=1 << 18):
+        self.buckets = max(1, maxEntries // 2)
+        self.slots = [None] * (self.buckets * 2)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def probe(self, key):
+        index = (key % self.buckets) * 2
+        entry = self.slots[index]
+        if entry is None or entry[0] != key:
+            entry = self.slots[index + 1]
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return entry
+
+    # entries are (key, depth, score, bound, bestMove)
+    def store(self, key, depth, score, bound, bestMove):
+        index = (key % self.buckets) * 2
+        slots = self.slots
+        deep, recent = slots[index], slots[index + 1]
+        if recent is not None and recent[0] == key:
+            recent = slots[index + 1] = None
+        entry = (key, depth, score, bound, bestMove)
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            if deep is not None and deep[0] != key:
+                if recent is not None:
+                    self.replacements += 1
+                slots[index + 1] = deep
+            slots[index] = entry
+        else:
+            if recent is not None:
+                self.replacements += 1
+            slots[index + 1] = entry
+        self.stores += 1
+
+    def clear(self):
+        self.slots = [None] * (self.buckets * 2)
+        self.hits = self.misses = self.stores = self.replacements = 0
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "entries": sum(entry is not None for entry in self.slots),
+            "capacity": len(self.slots),
+        }
+
+
+# Optional search instrumentation. Counters are kept per remaining depth (0 = leaves);
+# attaching it to a game also wraps evaluate, the win checks and getValidMoves with timers,
+# so a game without stats runs the plain methods.
+class SearchStats:
+    counters = ("nodes", "leaves", "terminals", "cutoffs", "researches")
+    timedMethods = ("evaluate", "lastMoveWins", "checkWinner", "getValidMoves")
+
+    def __init__(self):
+        self.timings = {}
+        self.calls = {}
+        self.reset()
+
+    # cleared in place, the timers of attached games hold on to these dicts
+    def reset(self):
+        self.depths = {}
+        self.timings.update(dict.fromkeys(self.timedMethods, 0.0))
+        self.calls.update(dict.fromkeys(self.timedMethods, 0))
+        self.started = time.perf_counter()
+
+    def level(self, depth):
+        if depth not in self.depths:
+            self.depths[depth] = dict.fromkeys(self.counters, 0)
+            self.depths[depth]["cutoffIndex"] = {}
+        return self.depths[depth]
+
+    def add(self, counter, depth):
+        self.level(depth)[counter] += 1
+
+    def addCutoff(self, depth, index):
+        level = self.level(depth)
+        level["cutoffs"] += 1
+        level["cutoffIndex"][index] = level["cutoffIndex"].get(index, 0) + 1
+
+    def timed(self, name, function):
+        timings, calls = self.timings, self.calls
+
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                timings[name] += time.perf_counter() - start
+                calls[name] += 1
+        return wrapper
+
+    def total(self, counter):
+        return sum(level[counter] for level in self.depths.values())
+
+    def toDict(self):
+        elapsed = time.perf_counter() - self.started
+        nodes = self.total("nodes")
+        cutoffs = self.total("cutoffs")
+        firstMove = sum(level["cutoffIndex"].get(0, 0) for level in self.depths.values())
+        return {
+            "elapsedMs": round(elapsed * 1000, 3),
+            "nodes": nodes,
+            "nodesPerSecond": round(nodes / elapsed) if elapsed > 0 else 0,
+            "leaves": self.total("leaves"),
+            "terminals": self.total("terminals"),
+            "cutoffs": cutoffs,
+            "researches": self.total("researches"),
+            "firstMoveCutoffRate": firstMove / cutoffs if cutoffs else 0.0,
+            "depths": {depth: dict(level, cutoffIndex=dict(sorted(level["cutoffIndex"].items())))
+                       for depth, level in sorted(self.depths.items(), reverse=True)},
+            "timingsMs": {name: round(value * 1000, 3) for name, value in self.timings.items()},
+            "calls": dict(self.calls),
+        }
+
+    def toJson(self):
+        return json.dumps(self.toDict())
+
+    def summary(self):
+        data = self.toDict()
+        timings = data["timingsMs"]
+        return (f"{data['nodes']} nodes in {data['elapsedMs']:.0f} ms ({data['nodesPerSecond']} nodes/s), "
+                f"{data['leaves']} leaves, {data['cutoffs']} cutoffs "
+                f"({data['firstMoveCutoffRate']:.0%} on the first move), {data['terminals']} terminals | "
+                f"evaluate {timings['evaluate']:.0f} ms, win checks {timings['lastMoveWins']:.0f} ms, "
+                f"getValidMoves {timings['getValidMoves']:.0f} ms")
+
+
+# (run length, open ends) of the line a stone at the candidate would complete, for the
+# mover's own stones and for the opponent's stones it would block
+attackScores = {(5, 0): 1000000, (5, 1): 1000000, (5, 2): 1000000,
+                (4, 2): 100000, (4, 1): 10000, (3, 2): 5000, (3, 1): 500, (2, 2): 200, (2, 1): 50,
+                (1, 2): 10, (1, 1): 5}
+blockScores = {(5, 0): 500000, (5, 1): 500000, (5, 2): 500000,
+               (4, 2): 50000, (4, 1): 4000, (3, 2): 2000, (3, 1): 200, (2, 2): 100, (2, 1): 20}
+# the same scores flat, indexed by run * 3 + open ends, so threatScore reads them without
+# building a key
+attackTable = tuple(attackScores.get((run, ends), 0) for run in range(6) for ends in range(3))
+blockTable = tuple(blockScores.get((run, ends), 0) for run in range(6) for ends in range(3))
+killerScores = (3000, 2500)
+# negamax keeps scores finite so that null windows (alpha, alpha + 1) exist; a won position
+# is worth winScore, far above anything evaluate returns, and pvs turns it back into inf
+winScore = 1 << 40
+historyCap = 1000
+
+
+# Ranks candidates so alpha-beta meets its cutoffs early: the hash move, then threats
+# (wins, blocks of opponent fours, fours, open threes, ...), then killer moves that caused
+# a cutoff at the same depth, then moves with a good cutoff history.
+class MoveOrderer:
+    def __init__(self, maxDepth=64):
+        self.killers = [[None, None] for _ in range(maxDepth + 1)]
+        self.history = {player: {} for player in stoneColors}
+
+    def clear(self):
+        self.killers = [[None, None] for _ in self.killers]
+        self.history = {player: {} for player in stoneColors}
+
+    # an orderer of its own with these killers and history, for a search on another thread
+    def copy(self):
+        orderer = MoveOrderer(len(self.killers) - 1)
+        orderer.killers = [list(killers) for killers in self.killers]
+        orderer.history = {player: dict(history) for player, history in self.history.items()}
+        return orderer
+
+    # sorts moves in place, best first, and returns them
+    def orderMoves(self, game, moves, player, depth, hashMove=None):
+        self.rankMoves(game, moves, player, depth, hashMove)
+        moves.sort(key=game.moveScoreOf, reverse=True)
+        return moves
+
+    # (score, move) pairs, best first
+    def scoreMoves(self, game, moves, player, depth, hashMove=None):
+        scores = self.rankMoves(game, moves, player, depth, hashMove)
+        scored = [(scores[move], move) for move in moves]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+    # the ordering score of every move, written into the game's moveScores
+    def rankMoves(self, game, moves, player, depth, hashMove=None):
+        killers = self.killers[depth] if depth < len(self.killers) else (None, None)
+        history = self.history[player]
+        scores = game.moveScores
+        for move in moves:
+            if move == hashMove:
+                score = math.inf
+            else:
+                score = game.threatScore(move[0], move[1], player)
+                if move == killers[0]:
+                    score += killerScores[0]
+                elif move == killers[1]:
+                    score += killerScores[1]
+                score += min(history.get(move, 0), historyCap)
+            scores[move] = score
+        return scores
+
+    def recordCutoff(self, move, player, depth):
+        if depth < len(self.killers):
+            killers = self.killers[depth]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        history = self.history[player]
+        history[move] = history.get(move, 0) + depth * depth
+
+
+# Selective search for pvs: late move reductions and a beam. Moves are taken in the move
+# orderer's order; a move is quiet when its ordering score (threatScore, what it builds and
+# what it blocks, plus killer and history bonuses) stays under quietBelow, so the hash move,
+# killers and moves that make or stop a three or more are never touched.
+# With reduceAfter moves searched, later quiet moves are searched reduction plies shallower,
+# and searched again to full depth if they beat alpha. From beamPly plies below the root
+# only the first beamWidth moves and the non-quiet ones are searched; the rest come back
+# as pruned and the search falls back on them only if everything it searched loses.
+class SelectiveSearch:
+    def __init__(self, reduceAfter=4, reduction=1, beamWidth=10, beamPly=2, quietBelow=2000):
+        self.reduceAfter = reduceAfter
+        self.reduction = reduction
+        self.beamWidth = beamWidth
+        self.beamPly = beamPly
+        self.quietBelow = quietBelow
+
+    @classmethod
+    def level(cls, name):
+        return cls(**selectiveLevels[name])
+
+    # Reduced and beam-pruned scores are not the full-width ones, so negamax keeps them
+    # under table keys of their own; the key is drawn from the settings, so searches with
+    # the same settings share entries across games, processes and a persistent cache
+    def tableKey(self):
+        settings = (self.reduceAfter, self.reduction, self.beamWidth, self.beamPly, self.quietBelow)
+        return random.Random(f"selective{settings}").getrandbits(64)
+
+    # (searched, pruned) from the (score, move) pairs of scoreMoves: the moves to search,
+    # each with its depth reduction, and the moves the beam dropped
+    def select(self, scored, depth, ply):
+        reduceFrom = self.reduceAfter if depth >= 2 else len(scored)
+        width = self.beamWidth if ply >= self.beamPly else len(scored)
+        if len(scored) <= min(reduceFrom, width):
+            return [(move, 0) for _, move in scored], []
+        # a reduced move still has at least its leaf ply
+        reduction = min(self.reduction, depth - 1)
+        searched, pruned = [], []
+        for index, (score, move) in enumerate(scored):
+            if index < reduceFrom and index < width:
+                searched.append((move, 0))
+            elif score >= self.quietBelow:
+                searched.append((move, 0))
+            elif index >= width:
+                pruned.append((move, reduction))
+            else:
+                searched.append((move, reduction))
+        return searched, pruned
+
+
+# settings of SelectiveSearch from cautious to aggressive
+selectiveLevels = {
+    "light": {"reduceAfter": 6, "reduction": 1, "beamWidth": 16, "beamPly": 1},
+    "normal": {"reduceAfter": 4, "reduction": 1, "beamWidth": 10, "beamPly": 1},
+    "aggressive": {"reduceAfter": 3, "reduction": 2, "beamWidth": 6, "beamPly": 1},
+}
 
 
 class Gomoku:
-    def __init__(self, boardSize):
+    def __new__(cls, boardSize=None, backend="list", **options):
+        if cls is Gomoku:
+            if backend not in boardBackends:
+                raise ValueError(f"Unknown board backend: {backend}")
+            cls = boardBackends[backend]
+        return super().__new__(cls)
+
+    def __init__(self, boardSize, backend="list", transpositionTable=None, moveOrderer=None, candidateRadius=1,
+                 parallelSearch=None, stats=None, batchEvaluator=None, threatSolver=None, openingBook=None,
+                 symmetricTable=False, evaluator="window", seed=None, searchAlgorithm="alphaBeta",
+                 aspirationWindow=500, selectiveSearch=None, alphaBetaOpponent=miniMaxAI, monteCarlo=None):
+        if evaluator not in evaluators:
+            raise ValueError(f"Unknown evaluator: {evaluator}")
+        if searchAlgorithm not in searchAlgorithms:
+            raise ValueError(f"Unknown search algorithm: {searchAlgorithm}")
+        if selectiveSearch is not None and searchAlgorithm != "pvs":
+            raise ValueError("selectiveSearch needs searchAlgorithm=\"pvs\"")
+        if batchEvaluator is not None and evaluator != "window":
+            raise ValueError("the batch evaluator only scores windows")
         self.boardSize = boardSize
-        self.board = [[emptyCell for _ in range(boardSize)] for _ in range(boardSize)]
+        self.backend = backend
+        self.board = Board(boardSize, max(1, candidateRadius))
+        self.cells = self.board.cells
+        self.rowStart = [self.board.index(row, 0) for row in range(boardSize)]
+        self.lineSteps = (self.board.stride, 1, self.board.stride + 1, self.board.stride - 1)
+        self.lineStepPairs = tuple((step, -step) for step in self.lineSteps)
         self.winCondition = 5
+        self.moveHistory = []
+        self.nodeCount = 0
+        self.transpositionTable = transpositionTable
+        self.moveOrderer = moveOrderer
+        self.parallelSearch = parallelSearch
+        self.batchEvaluator = batchEvaluator
+        self.threatSolver = threatSolver
+        self.openingBook = openingBook
+        self.symmetricTable = symmetricTable
+        self.evaluator = evaluator
+        self.searchAlgorithm = searchAlgorithm
+        self.aspirationWindow = aspirationWindow
+        self.selectiveSearch = selectiveSearch
+        # the colour alphaBeta and pvs play against and make the replies of
+        self.alphaBetaOpponent = alphaBetaOpponent
+        # the GomokuMCTS.MonteCarloSearch that plays mctsAI; it keeps its tree between moves
+        self.monteCarlo = monteCarlo
+        self.rootPly = 0
+        # the fallback moves of minimax and alphaBeta are drawn from rng; with a seed they
+        # come from the game's own generator, so a search can be repeated exactly
+        self.rng = random if seed is None else random.Random(seed)
+        self.control = None
+        self.nextPoll = math.inf
+        self.completedDepth = 0
+        self.initEvaluation()
+        self.initZobrist()
+        self.initFrontier(candidateRadius)
+        self.stats = None
+        self.attachStats(stats)
+
+    def attachStats(self, stats):
+        for name in SearchStats.timedMethods:
+            self.__dict__.pop(name, None)
+        self.stats = stats
+        if stats is not None:
+            for name in SearchStats.timedMethods:
+                setattr(self, name, stats.timed(name, getattr(self, name)))
+
+    # The frontier is every empty cell within candidateRadius of a stone. Each cell counts
+    # the stones around it, so a move only touches its own neighbourhood. The counts are
+    # flat like the board and the padding is at least candidateRadius wide, so neighbours
+    # are fixed index offsets; padding cells are never empty and never join the frontier.
+    def initFrontier(self, candidateRadius):
+        if candidateRadius < 1:
+            raise ValueError("candidateRadius must be at least 1")
+        if candidateRadius > self.board.pad:
+            raise ValueError("candidateRadius is wider than the board padding")
+        self.candidateRadius = candidateRadius
+        self.neighbourOffsets = [(dr, dc) for dr in range(-candidateRadius, candidateRadius + 1)
+                                 for dc in range(-candidateRadius, candidateRadius + 1) if dr or dc]
+        stride = self.board.stride
+        self.neighbourSteps = [dr * stride + dc for dr, dc in self.neighbourOffsets]
+        self.neighbourCounts = [0] * len(self.cells)
+        self.cellCoords = [None] * len(self.cells)
+        for row in range(self.boardSize):
+            for col in range(self.boardSize):
+                self.cellCoords[self.rowStart[row] + col] = (row, col)
+        self.frontier = set()
+        # the searches take their candidates in the buffer of their ply (the stone count)
+        # and the orderer scores them into moveScores, so a node reuses the containers of
+        # the last node at its ply instead of allocating its own; both are bounded by the
+        # board, however long the search runs
+        self.moveBuffers = [[] for _ in range(self.boardSize * self.boardSize + 1)]
+        self.moveScores = dict.fromkeys(filter(None, self.cellCoords), 0)
+        self.moveScoreOf = self.moveScores.__getitem__
+
+    def updateFrontier(self, row, col, delta):
+        counts = self.neighbourCounts
+        cells = self.cells
+        coords = self.cellCoords
+        frontier = self.frontier
+        index = self.rowStart[row] + col
+        if delta > 0:
+            frontier.discard(coords[index])
+        for step in self.neighbourSteps:
+            i = index + step
+            counts[i] += delta
+            if cells[i] == emptyCell:
+                if counts[i] == 0:
+                    frontier.discard(coords[i])
+                elif delta > 0 and counts[i] == 1:
+                    frontier.add(coords[i])
+        if delta < 0 and counts[index] > 0:
+            frontier.add(coords[index])
+
+    # seeded per board size so hashes are stable across runs and processes
+    def initZobrist(self):
+        rng = random.Random(self.boardSize)
+        self.zobrist = [[(0,) + tuple(rng.getrandbits(64) for _ in (PLAYER, miniMaxAI, AlphaBetaAI))
+                         for _ in range(self.boardSize)] for _ in range(self.boardSize)]
+        self.zobristSide = rng.getrandbits(64)
+        self.zobristAlphaBeta = rng.getrandbits(64)
+        # negamax stores scores from the mover's side, so it keeps its own table entries
+        self.zobristNegamax = rng.getrandbits(64)
+        # scores differ between evaluators, so their table entries must not mix
+        self.evaluatorKey = rng.getrandbits(64) if self.evaluator == "pattern" else 0
+        self.selectiveKey = self.selectiveSearch.tableKey() if self.selectiveSearch is not None else 0
+        # mctsAI's keys come from a generator of their own, so the keys of the other colours,
+        # and the books and caches stored under them, stay what they were
+        mctsRng = random.Random(f"mcts{self.boardSize}")
+        self.zobrist = [[keys + (mctsRng.getrandbits(64),) for keys in row] for row in self.zobrist]
+        self.hash = 0
+        self.initSymmetry()
+
+    # hashes[t] is the hash of the board seen through symmetry t, kept up to date by
+    # makeMove and undoMove from symmetryKeys[r][c][player], the keys (r, c) takes under
+    # each transform. Equivalent positions share min(hashes), the canonical hash.
+    def initSymmetry(self):
+        size = self.boardSize
+        self.symmetryMaps, self.inverseMaps = symmetryMaps(size)
+        self.symmetryKeys = [[tuple(tuple(self.zobrist[image // size][image % size][player]
+                                          for image in (cells[row * size + col] for cells in self.symmetryMaps))
+                                    for player in (emptyCell,) + stoneColors)
+                              for col in range(size)] for row in range(size)]
+        self.hashes = [0] * len(self.symmetryMaps)
+
+    def canonicalHash(self):
+        key = min(self.hashes)
+        return key, self.hashes.index(key)
+
+    def toCanonical(self, move, transform):
+        if move is None or transform == 0:
+            return move
+        return divmod(self.symmetryMaps[transform][move[0] * self.boardSize + move[1]], self.boardSize)
+
+    def fromCanonical(self, move, transform):
+        if move is None or transform == 0:
+            return move
+        return divmod(self.inverseMaps[transform][move[0] * self.boardSize + move[1]], self.boardSize)
+
+    # the table key of the position and the transform its moves are stored under; with
+    # symmetricTable all 8 orientations share an entry. evaluate reads every window in one
+    # direction, so mirrored positions can score slightly differently and a shared entry
+    # trades that for the extra hits. The pattern evaluator scores whole lines, which read
+    # the same both ways, so its shared entries are exact
+    def tableKey(self):
+        if self.symmetricTable:
+            key, transform = self.canonicalHash()
+            return key ^ self.evaluatorKey, transform
+        return self.hash ^ self.evaluatorKey, 0
+
+    # every (start cell, direction) pair of evaluateFull is a window; each cell keeps the
+    # windows it belongs to so a move only touches those. The pattern evaluator uses the
+    # same machinery with every whole row, column and diagonal of five or more cells as a
+    # window, scored through patternTables
+    def initEvaluation(self):
+        size = self.boardSize
+        pattern = self.evaluator == "pattern"
+        self.windowCodes = []
+        self.cellWindows = [[[] for _ in range(size)] for _ in range(size)]
+        for dr, dc in lineDirections:
+            for row in range(size):
+                for col in range(size):
+                    if pattern and 0 <= row - dr < size and 0 <= col - dc < size:
+                        continue
+                    cells = []
+                    r, c = row, col
+                    while 0 <= r < size and 0 <= c < size and (pattern or len(cells) < self.winCondition):
+                        cells.append((r, c))
+                        r, c = r + dr, c + dc
+                    if pattern:
+                        if len(cells) < self.winCondition:
+                            continue
+                        tables = patternTables(len(cells))[:3]
+                    else:
+                        tables = (windowScores[PLAYER][len(cells)], windowScores[miniMaxAI][len(cells)],
+                                  windowScores[AlphaBetaAI][len(cells)])
+                    window = len(self.windowCodes)
+                    self.windowCodes.append(0)
+                    for i, (r, c) in enumerate(cells):
+                        self.cellWindows[r][c].append((window, 5 ** i) + tables)
+        self.evalScores = {PLAYER: 0, miniMaxAI: 0, AlphaBetaAI: 0}
+
+    def updateEvaluation(self, row, col, delta):
+        codes = self.windowCodes
+        s1 = s2 = s3 = 0
+        for window, power, t1, t2, t3 in self.cellWindows[row][col]:
+            old = codes[window]
+            new = old + delta * power
+            codes[window] = new
+            s1 += t1[new] - t1[old]
+            s2 += t2[new] - t2[old]
+            s3 += t3[new] - t3[old]
+        scores = self.evalScores
+        scores[PLAYER] += s1
+        scores[miniMaxAI] += s2
+        scores[AlphaBetaAI] += s3
 
     def printBoard(self):
         print("   " + "|".join(f"{i:2}" for i in range(self.boardSize)))
@@ -30,45 +802,152 @@ class Gomoku:
             return " M"
         elif cell == AlphaBetaAI:
             return " A"
+        elif cell == mctsAI:
+            return " T"
 
     def isValidMove(self, row, col):
-        return 0 <= row < self.boardSize and 0 <= col < self.boardSize and self.board[row][col] == emptyCell
+        return 0 <= row < self.boardSize and 0 <= col < self.boardSize and \
+            self.cells[self.rowStart[row] + col] == emptyCell
 
     def makeMove(self, row, col, player):
         if self.isValidMove(row, col):
-            self.board[row][col] = player
+            index = self.rowStart[row] + col
+            self.cells[index] = player
+            self.moveHistory.append(self.cellCoords[index])
+            self.updateEvaluation(row, col, player)
+            self.hash ^= self.zobrist[row][col][player]
+            self.hashes[:] = map(xor, self.hashes, self.symmetryKeys[row][col][player])
+            self.updateFrontier(row, col, 1)
             return True
         return False
+
+    def undoMove(self, row, col):
+        index = self.rowStart[row] + col
+        player = self.cells[index]
+        self.updateEvaluation(row, col, -player)
+        self.hash ^= self.zobrist[row][col][player]
+        self.hashes[:] = map(xor, self.hashes, self.symmetryKeys[row][col][player])
+        self.cells[index] = emptyCell
+        self.moveHistory.pop()
+        self.updateFrontier(row, col, -1)
+
+    # Everything makeMove changes, copied flat, so a position can be put back or sent to
+    # another process without replaying its moves. restore needs a game of the same size.
+    def snapshot(self):
+        return {"cells": self.board.snapshot(), "moveHistory": list(self.moveHistory),
+                "windowCodes": list(self.windowCodes), "evalScores": dict(self.evalScores),
+                "hash": self.hash, "hashes": list(self.hashes),
+                "neighbourCounts": list(self.neighbourCounts), "frontier": set(self.frontier)}
+
+    def restore(self, snapshot):
+        self.board.restore(snapshot["cells"])
+        self.moveHistory[:] = snapshot["moveHistory"]
+        self.windowCodes[:] = snapshot["windowCodes"]
+        self.evalScores.update(snapshot["evalScores"])
+        self.hash = snapshot["hash"]
+        self.hashes = list(snapshot["hashes"])
+        self.neighbourCounts[:] = snapshot["neighbourCounts"]
+        self.frontier = set(snapshot["frontier"])
+
+    @property
+    def lastMove(self):
+        return self.moveHistory[-1] if self.moveHistory else None
+
     def randomFreeCellIndex(self):
         count = self.freeCellsCounter()
         if count == 0:
             return None
-        return random.randrange(count)
+        return self.rng.randrange(count)
 
     def checkWinner(self, player):
         for row in range(self.boardSize):
             for col in range(self.boardSize):
-                if any(self.checkLine(row, col, dr, dc, player) for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1))):
+                if any(self.checkLine(row, col, dr, dc, player) for dr, dc in lineDirections):
                     return True
         return False
 
+    # the first cell that is not player ends the line, padding included
     def checkLine(self, row, col, dr, dc, player):
+        cells = self.cells
+        index = self.rowStart[row] + col
+        step = dr * self.board.stride + dc
         for i in range(self.winCondition):
-            r, c = row + dr * i, col + dc * i
-            if not (0 <= r < self.boardSize and 0 <= c < self.boardSize and self.board[r][c] == player):
+            if cells[index + step * i] != player:
                 return False
         return True
 
-    def getValidMoves(self):
-        directions = [(-1, -1), (-1, 0), (-1, 1),
-                      (0, -1),          (0, 1),
-                      (1, -1), (1, 0), (1, 1)]
+    # only the lines through (row, col) can have been completed by the stone placed there
+    def isWinningMove(self, row, col):
+        cells = self.cells
+        index = self.rowStart[row] + col
+        player = cells[index]
+        if player == emptyCell:
+            return False
+        for step in self.lineSteps:
+            count = 1
+            i = index + step
+            while cells[i] == player:
+                count += 1
+                i += step
+            i = index - step
+            while cells[i] == player:
+                count += 1
+                i -= step
+            if count >= self.winCondition:
+                return True
+        return False
+
+    def lastMoveWins(self, player):
+        if not self.moveHistory:
+            return False
+        row, col = self.moveHistory[-1]
+        return self.cells[self.rowStart[row] + col] == player and self.isWinningMove(row, col)
+
+    # how much a stone of player at the empty (row, col) would extend its own lines and cut
+    # the opponent's, from the contiguous runs on both sides in each direction
+    def threatScore(self, row, col, player):
+        cells = self.cells
+        index = self.rowStart[row] + col
+        score = 0
+        for pair in self.lineStepPairs:
+            own = opp = 1
+            ownOpen = oppOpen = 0
+            for direction in pair:
+                i = index + direction
+                while cells[i] == player:
+                    own += 1
+                    i += direction
+                if cells[i] == emptyCell:
+                    ownOpen += 1
+                i = index + direction
+                while cells[i] != emptyCell and cells[i] != player and cells[i] != borderCell:
+                    opp += 1
+                    i += direction
+                if cells[i] == emptyCell:
+                    oppOpen += 1
+            score += attackTable[min(own, 5) * 3 + ownOpen] + blockTable[min(opp, 5) * 3 + oppOpen]
+        return score
+
+    # a new list, or out refilled when given
+    def getValidMoves(self, out=None):
+        if out is None:
+            out = []
+        if self.frontier:
+            out[:] = self.frontier
+        else:
+            cells = self.cells
+            coords = self.cellCoords
+            out[:] = [coords[i] for i in range(len(cells)) if cells[i] == emptyCell]
+        return out
+
+    # the full-board scan the frontier replaces, kept as a reference
+    def scanValidMoves(self):
         valid_moves = set()
 
         for r in range(self.boardSize):
             for c in range(self.boardSize):
                 if self.board[r][c] != emptyCell:
-                    for dr, dc in directions:
+                    for dr, dc in self.neighbourOffsets:
                         nr, nc = r + dr, c + dc
                         if self.isValidMove(nr, nc):
                             valid_moves.add((nr, nc))
@@ -81,7 +960,9 @@ class Gomoku:
         return list(valid_moves)
 
     def freeCellsCounter(self):
-        return len(self.getValidMoves())
+        if self.frontier:
+            return len(self.frontier)
+        return self.boardSize * self.boardSize - len(self.moveHistory)
 
     def isDraw(self):
         if self.freeCellsCounter() > 1:
@@ -89,21 +970,25 @@ class Gomoku:
         return not (self.checkWinner(PLAYER) or self.checkWinner(miniMaxAI) or self.checkWinner(AlphaBetaAI))
 
     def evaluate(self, maximizingPlayer):
+        return self.evalScores[maximizingPlayer]
+
+    def evaluateFull(self, maximizingPlayer):
 
-        weights = {1: 10, 2: 100, 3: 1000, 4: 10000}
+        weights = windowWeights
         score = 0
-        directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-        opponents = {PLAYER, miniMaxAI, AlphaBetaAI} - {maximizingPlayer}
+        opponents = set(stoneColors) - {maximizingPlayer}
 
-        for dr, dc in directions:
+        cells = self.cells
+        for dr, dc in lineDirections:
+            step = dr * self.board.stride + dc
             for row in range(self.boardSize):
                 for col in range(self.boardSize):
                     cntMax, cntOpp = 0, 0
+                    index = self.rowStart[row] + col
                     for i in range(self.winCondition): # checking 5s in a row
-                        r, c = row + dr * i, col + dc * i
-                        if not (0 <= r < self.boardSize and 0 <= c < self.boardSize):
+                        cell = cells[index + step * i]
+                        if cell == borderCell:
                             break
-                        cell = self.board[r][c]
                         if cell == maximizingPlayer:
                             cntMax += 1
                         elif cell in opponents:
@@ -116,72 +1001,611 @@ class Gomoku:
         return score
 
     def minimax(self, depth, isMaximizing, depthLimit ,currrentPLayer =PLAYER):
+        self.nodeCount += 1
+        if self.nodeCount >= self.nextPoll:
+            self.pollControl()
+        stats = self.stats
+        if stats is not None:
+            stats.add("nodes", depthLimit - depth)
 
-        if self.checkWinner(miniMaxAI):
+        if self.lastMoveWins(miniMaxAI):
+            if stats is not None:
+                stats.add("terminals", depthLimit - depth)
             return math.inf, None
-        if self.checkWinner(currrentPLayer):
+        if self.lastMoveWins(currrentPLayer):
+            if stats is not None:
+                stats.add("terminals", depthLimit - depth)
             return -math.inf, None
         if depth == depthLimit :
+            if stats is not None:
+                stats.add("leaves", 0)
             return self.evaluate(miniMaxAI), None
 
-        moves = self.getValidMoves()
+        table = self.transpositionTable
+        if table is not None:
+            key, transform = self.tableKey()
+            key ^= self.zobristSide if isMaximizing else 0
+            entry = table.probe(key)
+            # the root always searches so its move choice is never taken from an older search
+            if entry is not None and depth > 0 and entry[1] >= depthLimit - depth:
+                return entry[2], self.fromCanonical(entry[4], transform)
+
+        moves = self.getValidMoves(self.moveBuffers[len(self.moveHistory)])
 
         bestMove = moves[self.randomFreeCellIndex()]
+        moves = self.orderMoves(moves, miniMaxAI if isMaximizing else PLAYER, depthLimit - depth,
+                                self.fromCanonical(entry[4], transform) if table is not None and entry is not None
+                                else None)
         if isMaximizing:
             maxEval = -math.inf
             for move in moves:
                 self.makeMove(*move, miniMaxAI)
                 evalScore, _ = self.minimax(depth + 1, False, depthLimit)
-                self.board[move[0]][move[1]] = emptyCell
+                self.undoMove(*move)
                 if evalScore > maxEval:
                     maxEval, bestMove = evalScore, move
-            return maxEval, bestMove
+                    if depth == 0 and self.control is not None:
+                        self.control.update(depthLimit, move, evalScore, self.nodeCount)
+            bestEval = maxEval
         else:
             minEval = math.inf
             for move in moves:
                 self.makeMove(*move, PLAYER)
                 evalScore, _ = self.minimax(depth + 1, True, depthLimit)
-                self.board[move[0]][move[1]] = emptyCell
+                self.undoMove(*move)
                 if evalScore < minEval:
                     minEval, bestMove = evalScore, move
-            return minEval, bestMove
+            bestEval = minEval
+        if self.moveOrderer is not None:
+            self.moveOrderer.recordCutoff(bestMove, miniMaxAI if isMaximizing else PLAYER, depthLimit - depth)
+        if table is not None:
+            table.store(key, depthLimit - depth, bestEval, exactBound, self.toCanonical(bestMove, transform))
+        return bestEval, bestMove
 
     def alphaBeta(self, depth, isMaximizing, alpha=-math.inf, beta=math.inf):
+        self.nodeCount += 1
+        if self.nodeCount >= self.nextPoll:
+            self.pollControl()
+        stats = self.stats
+        if stats is not None:
+            stats.add("nodes", depth)
+        opponent = self.alphaBetaOpponent
 
-        if self.checkWinner(AlphaBetaAI):
+        if self.lastMoveWins(AlphaBetaAI):
+            if stats is not None:
+                stats.add("terminals", depth)
             return math.inf, None
-        if self.checkWinner(miniMaxAI):
+        if self.lastMoveWins(opponent):
+            if stats is not None:
+                stats.add("terminals", depth)
             return -math.inf, None
         if depth == 0:
+            if stats is not None:
+                stats.add("leaves", 0)
             return self.evaluate(AlphaBetaAI), None
 
-        moves = self.getValidMoves()
+        table = self.transpositionTable
+        if table is not None:
+            key, transform = self.tableKey()
+            key ^= self.zobristAlphaBeta ^ (self.zobristSide if isMaximizing else 0)
+            entry = table.probe(key)
+            if entry is not None and entry[1] >= depth:
+                if entry[3] == exactBound:
+                    return entry[2], self.fromCanonical(entry[4], transform)
+                if entry[3] == lowerBound:
+                    alpha = max(alpha, entry[2])
+                else:
+                    beta = min(beta, entry[2])
+                if beta <= alpha:
+                    return entry[2], self.fromCanonical(entry[4], transform)
+            alphaOrig, betaOrig = alpha, beta
+
+        moves = self.getValidMoves(self.moveBuffers[len(self.moveHistory)])
 
         bestMove = moves[self.randomFreeCellIndex()]
+        moves = self.orderMoves(moves, AlphaBetaAI if isMaximizing else opponent, depth,
+                                self.fromCanonical(entry[4], transform) if table is not None and entry is not None
+                                else None)
+        childScores = None
+        if depth == 1 and self.batchEvaluator is not None:
+            childScores = self.batchChildScores(moves, AlphaBetaAI if isMaximizing else opponent)
         if isMaximizing:
             maxEval = -math.inf
-            for move in moves:
-                self.makeMove(*move, AlphaBetaAI)
-                evalScore, _ = self.alphaBeta(depth - 1, False, alpha, beta)
-                self.board[move[0]][move[1]] = emptyCell
+            for index, move in enumerate(moves):
+                if childScores is not None:
+                    evalScore = self.batchedChild(childScores[index])
+                else:
+                    self.makeMove(*move, AlphaBetaAI)
+                    evalScore, _ = self.alphaBeta(depth - 1, False, alpha, beta)
+                    self.undoMove(*move)
                 if evalScore > maxEval:
                     maxEval, bestMove = evalScore, move
+                    if self.control is not None and depth == self.control.rootDepth:
+                        self.control.update(depth, move, evalScore, self.nodeCount)
                 alpha = max(alpha, evalScore)
                 if beta <= alpha:
+                    if self.moveOrderer is not None:
+                        self.moveOrderer.recordCutoff(move, AlphaBetaAI, depth)
+                    if stats is not None:
+                        stats.addCutoff(depth, index)
                     break
-            return maxEval, bestMove
+            bestEval = maxEval
         else:
             minEval = math.inf
-            for move in moves:
-                self.makeMove(*move, miniMaxAI)
-                evalScore, _ = self.alphaBeta(depth - 1, True, alpha, beta)
-                self.board[move[0]][move[1]] = emptyCell
+            for index, move in enumerate(moves):
+                if childScores is not None:
+                    evalScore = self.batchedChild(childScores[index])
+                else:
+                    self.makeMove(*move, opponent)
+                    evalScore, _ = self.alphaBeta(depth - 1, True, alpha, beta)
+                    self.undoMove(*move)
                 if evalScore < minEval:
                     minEval, bestMove = evalScore, move
                 beta = min(beta, evalScore)
                 if beta <= alpha:
+                    if self.moveOrderer is not None:
+                        self.moveOrderer.recordCutoff(move, opponent, depth)
+                    if stats is not None:
+                        stats.addCutoff(depth, index)
+                    break
+            bestEval = minEval
+        if table is not None:
+            if bestEval <= alphaOrig:
+                bound = upperBound
+            elif bestEval >= betaOrig:
+                bound = lowerBound
+            else:
+                bound = exactBound
+            table.store(key, depth, bestEval, bound, self.toCanonical(bestMove, transform))
+        return bestEval, bestMove
+
+    # Principal variation search, the searchAlgorithm="pvs" form of alphaBeta: one negamax
+    # path scores every node for the side to move (color 1 for AlphaBetaAI, -1 for its
+    # opponent). The first child, the best by move order, gets the full window; the others
+    # only have to be shown worse with a null window, and are searched again with the full
+    # window when that fails. Takes and returns scores from AlphaBetaAI's side like alphaBeta.
+    def pvs(self, depth, alpha=-math.inf, beta=math.inf):
+        self.rootPly = len(self.moveHistory)
+        # like inf in alphaBeta, a win reaches beta = winScore and cuts off at once
+        score, move = self.negamax(depth, 1, max(alpha, -winScore), min(beta, winScore))
+        if score >= winScore:
+            return math.inf, move
+        if score <= -winScore:
+            return -math.inf, move
+        return score, move
+
+    def negamax(self, depth, color, alpha, beta):
+        self.nodeCount += 1
+        if self.nodeCount >= self.nextPoll:
+            self.pollControl()
+        stats = self.stats
+        if stats is not None:
+            stats.add("nodes", depth)
+
+        if self.lastMoveWins(AlphaBetaAI):
+            if stats is not None:
+                stats.add("terminals", depth)
+            return color * winScore, None
+        if self.lastMoveWins(self.alphaBetaOpponent):
+            if stats is not None:
+                stats.add("terminals", depth)
+            return -color * winScore, None
+        if depth == 0:
+            if stats is not None:
+                stats.add("leaves", 0)
+            return color * self.evaluate(AlphaBetaAI), None
+
+        player = AlphaBetaAI if color > 0 else self.alphaBetaOpponent
+        table = self.transpositionTable
+        entry = None
+        if table is not None:
+            key, transform = self.tableKey()
+            key ^= self.zobristNegamax ^ self.selectiveKey ^ (self.zobristSide if color > 0 else 0)
+            entry = table.probe(key)
+            if entry is not None and entry[1] >= depth:
+                if entry[3] == exactBound:
+                    return entry[2], self.fromCanonical(entry[4], transform)
+                if entry[3] == lowerBound:
+                    alpha = max(alpha, entry[2])
+                else:
+                    beta = min(beta, entry[2])
+                if beta <= alpha:
+                    return entry[2], self.fromCanonical(entry[4], transform)
+        alphaOrig = alpha
+
+        moves = self.getValidMoves(self.moveBuffers[len(self.moveHistory)])
+        bestMove = moves[self.randomFreeCellIndex()]
+        hashMove = self.fromCanonical(entry[4], transform) if entry is not None else None
+        childScores = None
+        if depth == 1 and self.batchEvaluator is not None:
+            moves = self.orderMoves(moves, player, depth, hashMove)
+            childScores = self.batchChildScores(moves, player)
+            searched, pruned = zip(moves, repeat(0)), ()
+        elif self.selectiveSearch is not None:
+            searched, pruned = self.selectiveSearch.select(self.scoreMoves(moves, player, depth, hashMove), depth,
+                                                           len(self.moveHistory) - self.rootPly)
+        else:
+            searched, pruned = zip(self.orderMoves(moves, player, depth, hashMove), repeat(0)), ()
+        best = -winScore - 1
+        index = 0
+        for plan in (searched, pruned):
+            # every move the beam kept loses: search the dropped ones after all, one of them
+            # may be the only defence
+            if plan is pruned and (not pruned or best > -winScore or alpha >= beta):
+                break
+            for move, reduction in plan:
+                if childScores is not None:
+                    score = self.batchedChild(childScores[index])
+                    score = winScore if score == math.inf else -winScore if score == -math.inf else score
+                    score *= color
+                else:
+                    self.makeMove(*move, player)
+                    if index == 0:
+                        score = -self.negamax(depth - 1, -color, -beta, -alpha)[0]
+                    else:
+                        # a late quiet move is probed at reduced depth first and only
+                        # searched to full depth when it beats alpha there
+                        score = -self.negamax(depth - 1 - reduction, -color, -alpha - 1, -alpha)[0]
+                        if reduction and score > alpha:
+                            if stats is not None:
+                                stats.add("researches", depth)
+                            score = -self.negamax(depth - 1, -color, -alpha - 1, -alpha)[0]
+                        # a leaf's score is exact whatever the window; otherwise a probe
+                        # that fails high is a lower bound, and the search is fail-soft, so
+                        # the full search can start from it
+                        if depth > 1 and alpha < score < beta:
+                            if stats is not None:
+                                stats.add("researches", depth)
+                            score = -self.negamax(depth - 1, -color, -beta, -score)[0]
+                    self.undoMove(*move)
+                if score > best:
+                    best, bestMove = score, move
+                    if self.control is not None and depth == self.control.rootDepth and color > 0:
+                        self.control.update(depth, move, math.inf if score >= winScore else
+                                            -math.inf if score <= -winScore else score, self.nodeCount)
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    if self.moveOrderer is not None:
+                        self.moveOrderer.recordCutoff(move, player, depth)
+                    if stats is not None:
+                        stats.addCutoff(depth, index)
+                    break
+                index += 1
+        if table is not None:
+            if best <= alphaOrig:
+                bound = upperBound
+            elif best >= beta:
+                bound = lowerBound
+            else:
+                bound = exactBound
+            table.store(key, depth, best, bound, self.toCanonical(bestMove, transform))
+        return best, bestMove
+
+    # alphaBeta or pvs, whichever the game was made with, from the root
+    def searchRoot(self, depth, alpha=-math.inf, beta=math.inf):
+        if self.searchAlgorithm == "pvs":
+            return self.pvs(depth, alpha, beta)
+        return self.alphaBeta(depth, True, alpha, beta)
+
+    # pvs in a window around guess, the score of the iteration two plies back: the side that
+    # moves last alternates between depths, and scores swing with it. A score outside the
+    # window only bounds the real one, so that side is opened and the depth searched again.
+    def aspirationSearch(self, depth, guess):
+        if self.searchAlgorithm != "pvs" or guess is None or guess in (math.inf, -math.inf):
+            return self.searchRoot(depth)
+        alpha, beta = guess - self.aspirationWindow, guess + self.aspirationWindow
+        while True:
+            score, move = self.pvs(depth, alpha, beta)
+            if score <= alpha and alpha != -math.inf:
+                alpha = -math.inf
+            elif score >= beta and beta != math.inf:
+                beta = math.inf
+            else:
+                return score, move
+            if self.stats is not None:
+                self.stats.add("researches", depth)
+
+    # The last ply of alphaBeta with a batch evaluator (GomokuNumpy.NumpyEvaluator): every
+    # child is scored in one call instead of being made, searched and undone one at a time.
+    # The caller still walks the scores in order with its usual cutoffs, so the result is
+    # the same as the sequential search; only the children it reads count as nodes. It is
+    # slower in wall time than the incremental evaluator (GomokuBench.py numpy).
+    def batchChildScores(self, moves, player):
+        scores = [None] * len(moves)
+        pending = []
+        for index, (row, col) in enumerate(moves):
+            if self.wouldWin(row, col, player):
+                scores[index] = math.inf if player == AlphaBetaAI else -math.inf
+            else:
+                pending.append(index)
+        if pending:
+            boards = self.batchEvaluator.childBatch(self.board, [moves[index] for index in pending], player)
+            for index, score in zip(pending, self.batchEvaluator.evaluateBatch(boards, AlphaBetaAI)):
+                scores[index] = int(score)
+        return scores
+
+    # a batched child the search reads, counted as the leaf the sequential search visits
+    def batchedChild(self, score):
+        self.nodeCount += 1
+        if self.stats is not None:
+            self.stats.add("nodes", 0)
+            self.stats.add("terminals" if score == math.inf or score == -math.inf else "leaves", 0)
+        return score
+
+    def wouldWin(self, row, col, player):
+        index = self.rowStart[row] + col
+        self.cells[index] = player
+        try:
+            return Gomoku.isWinningMove(self, row, col)
+        finally:
+            self.cells[index] = emptyCell
+
+    def pollControl(self):
+        if self.control is None:
+            self.nextPoll = math.inf
+            return
+        self.nextPoll = self.nodeCount + self.control.pollInterval
+        self.control.poll(self.nodeCount)
+
+    # Runs depth 1, 2, 3, ... until the time budget runs out and returns the move of the
+    # deepest iteration that finished. Depth 1 always finishes unless the search is
+    # cancelled, so there is always a move. Each iteration leaves its best moves in the
+    # transposition table, where the next one picks them up to search them first.
+    def iterativeDeepening(self, engine, timeLimitMs, maxDepth=None, opponent=PLAYER):
+        start = time.perf_counter()
+        deadline = start + timeLimitMs / 1000
+        ownTable = self.transpositionTable is None
+        if ownTable:
+            self.transpositionTable = TranspositionTable()
+        ownControl = self.control is None
+        if ownControl:
+            self.control = SearchControl()
+        control = self.control
+        outerDeadline = control.deadline
+        rootLength = len(self.moveHistory)
+        freeCells = self.board.count(emptyCell)
+        maxDepth = freeCells if maxDepth is None else min(maxDepth, freeCells)
+        result = (None, None)
+        scores = {}
+        self.completedDepth = 0
+        try:
+            for depth in range(1, maxDepth + 1):
+                control.deadline = None if depth == 1 else min(deadline, outerDeadline or math.inf)
+                control.rootDepth = control.depth = depth
+                self.nextPoll = self.nodeCount
+                try:
+                    if engine == AlphaBetaAI:
+                        result = self.aspirationSearch(depth, scores.get(depth - 2))
+                    else:
+                        result = self.minimax(0, True, depth, opponent)
+                except SearchTimeout as error:
+                    while len(self.moveHistory) > rootLength:
+                        self.undoMove(*self.moveHistory[-1])
+                    if isinstance(error, SearchCancelled):
+                        raise
                     break
-            return minEval, bestMove
+                self.completedDepth = depth
+                scores[depth] = result[0]
+                control.update(depth, result[1], result[0], self.nodeCount)
+                if result[0] in (math.inf, -math.inf):
+                    break
+                # the next iteration costs several times this one, so it would not finish
+                if time.perf_counter() - start > timeLimitMs / 2000:
+                    break
+        finally:
+            control.deadline = outerDeadline
+            control.rootDepth = None
+            self.nextPoll = math.inf
+            if ownControl:
+                self.control = None
+            if ownTable:
+                self.transpositionTable = None
+        return result
+
+    # the entry point for the CLI and GUI: a fixed-depth search, or iterative deepening
+    # when a time budget is given; a GomokuParallel.ParallelSearch attached to the game
+    # takes over fixed-depth searches, and a GomokuThreats.ThreatSolver gets to look for a
+    # forced win before either runs; in the opening a GomokuBook.OpeningBook answers first.
+    # mctsAI is played by the game's GomokuMCTS.MonteCarloSearch, depthLimit unused.
+    # A SearchControl passed in can cancel the search and receives its progress.
+    def findBestMove(self, engine, depthLimit, timeLimitMs=None, opponent=PLAYER, control=None):
+        previousControl = self.control
+        if control is not None:
+            self.control = control
+        try:
+            start = time.perf_counter()
+            if self.stats is not None:
+                self.stats.reset()
+            if self.openingBook is not None:
+                move = self.openingBook.lookup(self, engine)
+                if move is not None:
+                    self.completedDepth = 0
+                    # mctsAI has no evaluation of its own; its scores are win rates
+                    return (0.5 if engine == mctsAI else self.evaluate(engine)), move
+            if self.threatSolver is not None:
+                line = self.threatSolver.findWin(self, engine,
+                                                 self.alphaBetaOpponent if engine == AlphaBetaAI else opponent,
+                                                 timeLimitMs)
+                if line:
+                    self.completedDepth = len(line)
+                    return math.inf, line[0]
+            if timeLimitMs:
+                # the book and solver spend the same budget; depth 1 or one playout still runs
+                timeLimitMs = max(timeLimitMs - (time.perf_counter() - start) * 1000, 1)
+            if engine == mctsAI:
+                if self.monteCarlo is None:
+                    from GomokuMCTS import MonteCarloSearch
+                    self.monteCarlo = MonteCarloSearch()
+                return self.monteCarlo.search(self, opponent, timeLimitMs)
+            if timeLimitMs:
+                return self.iterativeDeepening(engine, timeLimitMs, depthLimit, opponent)
+            self.completedDepth = depthLimit
+            if self.parallelSearch is not None:
+                return self.parallelSearch.search(self, engine, depthLimit, opponent)
+            rootLength = len(self.moveHistory)
+            if self.control is not None:
+                self.control.rootDepth = depthLimit if engine == AlphaBetaAI else 0
+                self.control.depth = depthLimit
+                self.nextPoll = self.nodeCount
+            try:
+                if engine == AlphaBetaAI:
+                    result = self.searchRoot(depthLimit)
+                else:
+                    result = self.minimax(0, True, depthLimit, opponent)
+            except SearchTimeout:
+                while len(self.moveHistory) > rootLength:
+                    self.undoMove(*self.moveHistory[-1])
+                raise
+            if self.control is not None:
+                self.control.update(depthLimit, result[1], result[0], self.nodeCount)
+            return result
+        finally:
+            if self.control is not None:
+                self.control.rootDepth = None
+            self.control = previousControl
+            self.nextPoll = math.inf
+
+    # the orderer's (score, move) pairs, or threat scores in set order without one
+    def scoreMoves(self, moves, player, depth, hashMove=None):
+        if self.moveOrderer is not None:
+            return self.moveOrderer.scoreMoves(self, moves, player, depth, hashMove)
+        return [(math.inf if move == hashMove else self.threatScore(move[0], move[1], player), move)
+                for move in moves]
+
+    # moves reordered in place: the orderer's order, or the hash move first without one
+    def orderMoves(self, moves, player, depth, hashMove=None):
+        if self.moveOrderer is not None:
+            return self.moveOrderer.orderMoves(self, moves, player, depth, hashMove)
+        if hashMove is not None and hashMove in moves:
+            moves.remove(hashMove)
+            moves.insert(0, hashMove)
+        return moves
+# Keeps one big-int bitset per player next to the list board. Cell (r, c) is bit r * stride + c,
+# with stride = boardSize + 1 so the spare column stops shifts from wrapping between rows;
+# lines and neighbourhoods then become shifts and ANDs over the whole board at once.
+class BitboardGomoku(Gomoku):
+    def __init__(self, boardSize, backend="bitboard", **options):
+        super().__init__(boardSize, backend, **options)
+        self.stride = boardSize + 1
+        self.boardMask = 0
+        for row in range(boardSize):
+            self.boardMask |= ((1 << boardSize) - 1) << (row * self.stride)
+        self.shifts = (self.stride, 1, self.stride + 1, self.stride - 1)
+        self.bits = dict.fromkeys(stoneColors, 0)
+        self.occupied = 0
+
+    # The frontier is read from the occupied bitset when moves are generated, which only
+    # interior nodes do, instead of being counted by every makeMove and undoMove. It is
+    # still exposed as a set for the readers of game.frontier; assigning one is ignored.
+    @property
+    def frontier(self):
+        return set(self.getValidMoves()) if self.neighbourMask() else set()
+
+    @frontier.setter
+    def frontier(self, value):
+        pass
+
+    def updateFrontier(self, row, col, delta):
+        pass
+
+    # the neighbour counts the list backend keeps, rebuilt so any game can restore it
+    def snapshot(self):
+        snapshot = super().snapshot()
+        counts = [0] * len(self.cells)
+        for row, col in self.moveHistory:
+            index = self.rowStart[row] + col
+            for step in self.neighbourSteps:
+                counts[index + step] += 1
+        snapshot["neighbourCounts"] = counts
+        return snapshot
+
+    def restore(self, snapshot):
+        super().restore(snapshot)
+        self.bits = dict.fromkeys(stoneColors, 0)
+        self.occupied = 0
+        for row, col in self.moveHistory:
+            bit = 1 << (row * self.stride + col)
+            self.bits[self.cells[self.rowStart[row] + col]] |= bit
+            self.occupied |= bit
+
+    # the list backend's makeMove and undoMove with the bitsets in place of the frontier
+    def makeMove(self, row, col, player):
+        if self.isValidMove(row, col):
+            index = self.rowStart[row] + col
+            self.cells[index] = player
+            self.moveHistory.append(self.cellCoords[index])
+            self.updateEvaluation(row, col, player)
+            self.hash ^= self.zobrist[row][col][player]
+            self.hashes[:] = map(xor, self.hashes, self.symmetryKeys[row][col][player])
+            bit = 1 << (row * self.stride + col)
+            self.bits[player] |= bit
+            self.occupied |= bit
+            return True
+        return False
+
+    def undoMove(self, row, col):
+        index = self.rowStart[row] + col
+        player = self.cells[index]
+        self.updateEvaluation(row, col, -player)
+        self.hash ^= self.zobrist[row][col][player]
+        self.hashes[:] = map(xor, self.hashes, self.symmetryKeys[row][col][player])
+        self.cells[index] = emptyCell
+        self.moveHistory.pop()
+        bit = 1 << (row * self.stride + col)
+        self.bits[player] &= ~bit
+        self.occupied &= ~bit
+
+    # bits that start a run of winCondition stones of the player along shift
+    def runStarts(self, stones, shift):
+        run = stones
+        length = 1
+        while length * 2 <= self.winCondition:
+            run &= run >> (shift * length)
+            length *= 2
+        if length < self.winCondition:
+            run &= run >> (shift * (self.winCondition - length))
+        return run
+
+    def checkWinner(self, player):
+        stones = self.bits.get(player, 0)
+        return any(self.runStarts(stones, shift) for shift in self.shifts)
+
+    def neighbourMask(self):
+        occupied = self.occupied
+        spread = occupied
+        for _ in range(self.candidateRadius):
+            grown = spread
+            for shift in self.shifts:
+                grown |= (spread << shift) | (spread >> shift)
+            spread = grown & self.boardMask
+        return spread & ~occupied
+
+    # a new list, or out refilled when given
+    def getValidMoves(self, out=None):
+        if out is None:
+            out = []
+        free = self.neighbourMask()
+        if not free:
+            free = ~self.occupied & self.boardMask
+        out.clear()
+        stride = self.stride
+        while free:
+            low = free & -free
+            out.append(divmod(low.bit_length() - 1, stride))
+            free ^= low
+        return out
+
+    def freeCellsCounter(self):
+        if self.occupied:
+            return bin(self.neighbourMask()).count("1")
+        return self.boardSize * self.boardSize
+
+
+boardBackends = {"list": Gomoku, "bitboard": BitboardGomoku}
+evaluators = ("window", "pattern")
+searchAlgorithms = ("alphaBeta", "pvs")
+
+
 def main():
     print("Welcome to Gomoku! Connect five in a row to win.")
     while True:
@@ -194,21 +1618,28 @@ def main():
         except ValueError:
             print("Invalid input. Please enter an integer.")
 
-    game = Gomoku(size)
+    from GomokuThreats import ThreatSolver
+    from GomokuBook import loadBook
+    from GomokuCache import loadSharedCache, defaultCachePath
 
     # game mode
     while True:
         try:
-            mode = int(input("Select mode: \n1 - Human vs Minimax AI\n2 - Minimax AI vs AlphaBeta AI: "))
-            if mode not in (1, 2):
-                print("Please select 1 or 2.")
+            mode = int(input("Select mode: \n1 - Human vs Minimax AI\n2 - Minimax AI vs AlphaBeta AI"
+                             "\n3 - Human vs MCTS AI\n4 - MCTS AI vs AlphaBeta AI: "))
+            if mode not in (1, 2, 3, 4):
+                print("Please select 1, 2, 3 or 4.")
             else:
                 break
         except ValueError:
-            print("Invalid input. Please enter 1 or 2.")
+            print("Invalid input. Please enter 1, 2, 3 or 4.")
+    # modes 1 and 3 put the human against the engine, 2 and 4 the engine against AlphaBeta
+    engine, engineName = (miniMaxAI, "Minimax AI") if mode in (1, 2) else (mctsAI, "MCTS AI")
+    versusHuman = mode in (1, 3)
 
     # AI depth inputs
-    while True:
+    depthLimit = playouts = None
+    while engine == miniMaxAI:
         try:
             depthLimit = int(input("Enter depth limit for Minimax AI (>=1): "))
             if depthLimit < 1:
@@ -218,7 +1649,17 @@ def main():
         except ValueError:
             print("Invalid input. Please enter an integer.")
 
-    while True:
+    while engine == mctsAI:
+        try:
+            playouts = int(input("Enter playouts per move for MCTS AI (>=1): "))
+            if playouts < 1:
+                print("Playouts must be at least 1.")
+            else:
+                break
+        except ValueError:
+            print("Invalid input. Please enter an integer.")
+
+    while mode != 3:
         try:
             abDepth = int(input("Enter depth limit for AlphaBeta AI (>=1): "))
             if abDepth < 1:
@@ -228,10 +1669,37 @@ def main():
         except ValueError:
             print("Invalid input. Please enter an integer.")
 
+    while True:
+        try:
+            timeLimitMs = int(input("Enter time budget per AI move in ms (0 = fixed depth): "))
+            if timeLimitMs < 0:
+                print("Time budget cannot be negative.")
+            else:
+                break
+        except ValueError:
+            print("Invalid input. Please enter an integer.")
+
+    cache = loadSharedCache()
+    monteCarlo = None
+    if engine == mctsAI:
+        from GomokuMCTS import MonteCarloSearch
+        monteCarlo = MonteCarloSearch(playouts)
+    game = Gomoku(size, transpositionTable=cache,
+                  moveOrderer=MoveOrderer(), threatSolver=ThreatSolver(), openingBook=loadBook(size),
+                  alphaBetaOpponent=engine, monteCarlo=monteCarlo)
+
+    while True:
+        showStats = input("Show search statistics after each AI move? (y/n): ").strip().lower()
+        if showStats in ("y", "n"):
+            break
+        print("Please answer y or n.")
+    if showStats == "y":
+        game.attachStats(SearchStats())
+
     game.printBoard()
 
     while True:
-        if mode == 1:
+        if versusHuman:
             while True:
                 try:
                     move = input("Enter your move as 'row,col': ")
@@ -250,39 +1718,49 @@ def main():
                 print("Game is a draw.")
                 break
 
-            print("Minimax AI is thinking...")
-            _, move = game.minimax(0, True, depthLimit )
+            print(f"{engineName} is thinking...")
+            _, move = game.findBestMove(engine, depthLimit, timeLimitMs)
             if move is None:
                 print("No moves left—game over.")
                 break
-            game.makeMove(*move, miniMaxAI)
-            print(f"Minimax AI played at: {move}")
+            game.makeMove(*move, engine)
+            print(f"{engineName} played at: {move}")
+            if game.stats is not None:
+                print(game.stats.summary())
+            if monteCarlo is not None:
+                print(monteCarlo.summary())
             game.printBoard()
-            if game.checkWinner(miniMaxAI):
-                print("Minimax AI wins!")
+            if game.checkWinner(engine):
+                print(f"{engineName} wins!")
                 break
             if game.isDraw():
                 print("Game is a draw.")
                 break
 
         else:
-            print("Minimax AI's turn...")
-            _, move = game.minimax(0, True, depthLimit ,AlphaBetaAI)
-            game.makeMove(*move, miniMaxAI)
-            print(f"Minimax AI played at: {move}")
+            print(f"{engineName}'s turn...")
+            _, move = game.findBestMove(engine, depthLimit, timeLimitMs, AlphaBetaAI)
+            game.makeMove(*move, engine)
+            print(f"{engineName} played at: {move}")
+            if game.stats is not None:
+                print(game.stats.summary())
+            if monteCarlo is not None:
+                print(monteCarlo.summary())
             game.printBoard()
-            if game.checkWinner(miniMaxAI):
-                print("Minimax AI wins!")
+            if game.checkWinner(engine):
+                print(f"{engineName} wins!")
                 break
             if game.isDraw():
                 print("Game is a draw.")
                 break
 
             print("AlphaBeta AI's turn...")
-            _, move = game.alphaBeta(abDepth, True)
+            _, move = game.findBestMove(AlphaBetaAI, abDepth, timeLimitMs)
 
             game.makeMove(*move, AlphaBetaAI)
             print(f"AlphaBeta AI played at: {move}")
+            if game.stats is not None:
+                print(game.stats.summary())
             game.printBoard()
             if game.checkWinner(AlphaBetaAI):
                 print("AlphaBeta AI wins!")
@@ -291,6 +1769,8 @@ def main():
                 print("Game is a draw.")
                 break
 
+    cache.save(defaultCachePath())
+
 
 if __name__ == "__main__":
    main()
\ No newline at end of file
@@ -0,0 +1,349 @@
+import math
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from GomokuGame import *
+
+
+# a node of the search tree: the position after mover played move. wins counts the
+# playouts through it that mover won, a draw or an evaluated cut-off counting as a fraction;
+# terminal is mover's result when the move ended the game. untried holds the moves not yet
+# expanded, worst first, and stays None until the node is first expanded.
+class TreeNode:
+    __slots__ = ("move", "mover", "parent", "children", "untried", "visits", "wins", "terminal")
+
+    def __init__(self, move, mover, parent):
+        self.move = move
+        self.mover = mover
+        self.parent = parent
+        self.children = {}
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+        self.terminal = None
+
+
+# per-process state of a root-parallel worker: its own MonteCarloSearch, whose tree is
+# reused from one move to the next like the serial one's
+workerState = {"engine": None, "settings": None}
+
+
+# options are the root game's constructor options its snapshot needs to restore
+def searchWorker(boardSize, options, position, opponent, settings, timeLimitMs):
+    if workerState["settings"] != settings:
+        workerState["engine"] = MonteCarloSearch(**settings)
+        workerState["settings"] = settings
+    engine = workerState["engine"]
+    game = Gomoku(boardSize, **options)
+    game.restore(position)
+    engine.search(game, opponent, timeLimitMs)
+    return {move: (child.visits, child.wins, child.terminal) for move, child in engine.root.children.items()}, \
+        engine.lastSearch
+
+
+# Monte Carlo tree search for mctsAI with UCT: every playout walks down the tree by the
+# upper confidence bound, adds one node, plays the position out and counts the result
+# for every node on its way back. Moves are the board's frontier; a node only expands the
+# width best by threatScore, or just the win or the blocks of a five when there are any.
+# Playouts are pattern-biased and cut off: each ply picks among the cells at the ends of
+# the runs through the last two stones plus a few random candidates, taking a five or the
+# block of one at once and otherwise one drawn in proportion to its threatScore; after
+# rolloutPlies the position is scored by the evaluator and squashed to a win probability.
+# The search is anytime: it runs for playouts playouts, or until timeLimitMs when one is
+# given, and can be stopped through the game's SearchControl. The tree stays between
+# moves, and the next search starts from the node of the position it is asked about when
+# the moves since were in it. With workers > 1 each worker process keeps its own tree and
+# searches the same position with its own seed; their root counts are added up.
+class MonteCarloSearch:
+    def __init__(self, playouts=1000, exploration=1.0, width=12, rolloutPlies=16, rolloutSample=4,
+                 evalScale=2000, workers=1, seed=None, pollInterval=32):
+        self.playouts = playouts
+        self.exploration = exploration
+        self.width = width
+        self.rolloutPlies = rolloutPlies
+        self.rolloutSample = rolloutSample
+        self.evalScale = evalScale
+        self.workers = workers
+        self.seed = seed
+        self.pollInterval = pollInterval
+        self.rng = random.Random(seed)
+        self.root = None
+        self.rootHistory = []
+        self.executors = None
+        self.lastSearch = {}
+
+    def settings(self, index):
+        return {"playouts": self.playouts, "exploration": self.exploration, "width": self.width,
+                "rolloutPlies": self.rolloutPlies, "rolloutSample": self.rolloutSample,
+                "evalScale": self.evalScale, "seed": None if self.seed is None else self.seed + index,
+                "pollInterval": self.pollInterval}
+
+    def close(self):
+        if self.executors is not None:
+            for executor in self.executors:
+                executor.shutdown(cancel_futures=True)
+            self.executors = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def clear(self):
+        self.root = None
+        self.rootHistory = []
+
+    # the node of the game's position in the last tree, detached from its parent, or None
+    # when the game did not get there from the last root
+    def reuseRoot(self, game, player):
+        history = game.moveHistory
+        known = len(self.rootHistory)
+        if self.root is None or len(history) < known or history[:known] != self.rootHistory:
+            return None
+        node = self.root
+        for row, col in history[known:]:
+            node = node.children.get((row, col))
+            if node is None or game.cells[game.rowStart[row] + col] != node.mover:
+                return None
+        if node.mover == player or node.terminal is not None:
+            return None
+        node.parent = None
+        return node
+
+    # (score, move): the move played most, with its win rate, or inf for a winning move
+    def search(self, game, opponent, timeLimitMs=None):
+        player = mctsAI
+        start = time.perf_counter()
+        if self.workers > 1:
+            return self.parallelSearch(game, opponent, timeLimitMs, start)
+        root = self.reuseRoot(game, player)
+        reused = root.visits if root is not None else 0
+        if root is None:
+            lastMove = game.lastMove
+            root = TreeNode(lastMove, opponent, None)
+        self.root, self.rootHistory = root, list(game.moveHistory)
+        deadline = start + timeLimitMs / 1000 if timeLimitMs else None
+        control = game.control
+        rootLength = len(game.moveHistory)
+        playouts = 0
+        try:
+            while deadline is not None or playouts < self.playouts:
+                self.playout(game, root, player, opponent)
+                playouts += 1
+                if root.untried == [] and not root.children:
+                    break
+                if playouts % self.pollInterval == 0:
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        break
+                    if control is not None:
+                        control.poll(game.nodeCount + playouts)
+                        score, move = self.bestMove(root)
+                        control.update(self.principalDepth(root), move, score, game.nodeCount + playouts)
+                if any(child.terminal == 1.0 for child in root.children.values()):
+                    break
+        except SearchTimeout as error:
+            while len(game.moveHistory) > rootLength:
+                game.undoMove(*game.moveHistory[-1])
+            if isinstance(error, SearchCancelled):
+                raise
+        game.nodeCount += playouts
+        game.completedDepth = self.principalDepth(root)
+        self.lastSearch = {"playouts": playouts, "reused": reused, "nodes": self.treeSize(root),
+                           "searchMs": round((time.perf_counter() - start) * 1000, 3)}
+        return self.bestMove(root)
+
+    def bestMove(self, root):
+        if not root.children:
+            return 0.0, None
+        child = max(root.children.values(), key=lambda node: (node.terminal == 1.0, node.visits))
+        if child.terminal == 1.0:
+            return math.inf, child.move
+        return child.wins / child.visits if child.visits else 0.0, child.move
+
+    def principalDepth(self, node):
+        depth = 0
+        while node.children:
+            node = max(node.children.values(), key=lambda child: child.visits)
+            depth += 1
+        return depth
+
+    def treeSize(self, root):
+        size, stack = 0, [root]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.children.values())
+        return size
+
+    def summary(self):
+        stats = self.lastSearch
+        if not stats:
+            return ""
+        return (f"{stats['playouts']} playouts in {stats['searchMs']:.0f} ms"
+                f" ({stats['playouts'] / max(stats['searchMs'], 1e-3) * 1000:.0f}/s), {stats['nodes']} tree nodes,"
+                f" {stats['reused']} playouts reused")
+
+    # one selection, expansion, playout and update, leaving the game as it found it
+    def playout(self, game, root, player, opponent):
+        node = root
+        made = 0
+        try:
+            while node.terminal is None and node.untried == [] and node.children:
+                node = self.select(node)
+                game.makeMove(*node.move, node.mover)
+                made += 1
+            if node.terminal is None:
+                mover = player if node.mover == opponent else opponent
+                if node.untried is None:
+                    node.untried = self.candidates(game, mover)
+                if node.untried:
+                    move = node.untried.pop()
+                    child = TreeNode(move, mover, node)
+                    node.children[move] = child
+                    game.makeMove(*move, mover)
+                    made += 1
+                    node = child
+                    if game.isWinningMove(*move):
+                        node.terminal = 1.0
+                elif not node.children:
+                    node.terminal = 0.5
+            if node.terminal is not None:
+                value = node.terminal if node.mover == player else 1.0 - node.terminal
+            else:
+                value = self.rollout(game, opponent if node.mover == player else player, player, opponent)
+        finally:
+            for _ in range(made):
+                game.undoMove(*game.moveHistory[-1])
+        while node is not None:
+            node.visits += 1
+            node.wins += value if node.mover == player else 1.0 - value
+            node = node.parent
+
+    def select(self, node):
+        explore = self.exploration * math.sqrt(math.log(node.visits))
+        best, bestValue = None, -math.inf
+        for child in node.children.values():
+            value = child.wins / child.visits + explore / math.sqrt(child.visits)
+            if value > bestValue:
+                best, bestValue = child, value
+        return best
+
+    # the moves a node expands, worst first so that pop() takes the best
+    def candidates(self, game, mover):
+        scored = [(game.threatScore(row, col, mover), (row, col)) for row, col in game.getValidMoves()]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if scored and scored[0][0] >= attackTable[15]:
+            scored = scored[:1]
+        elif scored and scored[0][0] >= blockTable[15]:
+            scored = [item for item in scored if item[0] >= blockTable[15]]
+        else:
+            scored = scored[:self.width]
+        return [move for _, move in reversed(scored)]
+
+    # plays up to rolloutPlies moves from the position, toMove first, and returns player's
+    # result: 1 or 0 when someone makes five, 0.5 on a full board, else the evaluation
+    def rollout(self, game, toMove, player, opponent):
+        other = opponent if toMove == player else player
+        made = 0
+        value = None
+        try:
+            for _ in range(self.rolloutPlies):
+                move = self.rolloutMove(game, toMove)
+                if move is None:
+                    value = 0.5
+                    break
+                game.makeMove(*move, toMove)
+                made += 1
+                if game.isWinningMove(*move):
+                    value = 1.0 if toMove == player else 0.0
+                    break
+                toMove, other = other, toMove
+            if value is None:
+                # evaluate scores the opponent's shapes against everyone else's
+                x = max(-50.0, min(50.0, game.evaluate(opponent) / self.evalScale))
+                value = 1.0 / (1.0 + math.exp(x))
+        finally:
+            for _ in range(made):
+                game.undoMove(*game.moveHistory[-1])
+        return value
+
+    def rolloutMove(self, game, toMove):
+        cells = game.cells
+        coords = game.cellCoords
+        history = game.moveHistory
+        if not history:
+            center = game.boardSize // 2
+            return center, center
+        candidates = []
+        for row, col in history[-2:]:
+            index = game.rowStart[row] + col
+            colour = cells[index]
+            for pair in game.lineStepPairs:
+                for step in pair:
+                    i = index + step
+                    while cells[i] == colour:
+                        i += step
+                    if cells[i] == emptyCell:
+                        candidates.append(coords[i])
+                        # past one gap, where a split three or four is completed
+                        i += step
+                        if cells[i] == colour:
+                            while cells[i] == colour:
+                                i += step
+                            if cells[i] == emptyCell:
+                                candidates.append(coords[i])
+        frontier = game.frontier
+        if frontier:
+            pool = tuple(frontier)
+            rng = self.rng
+            for _ in range(self.rolloutSample):
+                candidates.append(pool[rng.randrange(len(pool))])
+        elif not candidates:
+            return None
+        scores = [game.threatScore(row, col, toMove) for row, col in candidates]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        if scores[best] >= blockTable[15]:
+            return candidates[best]
+        pick = self.rng.random() * sum(scores)
+        for move, score in zip(candidates, scores):
+            pick -= score
+            if pick < 0:
+                return move
+        return candidates[best]
+
+    def parallelSearch(self, game, opponent, timeLimitMs, start):
+        if self.executors is None:
+            self.executors = [ProcessPoolExecutor(1) for _ in range(self.workers)]
+        position = game.snapshot()
+        options = {"evaluator": game.evaluator, "candidateRadius": game.candidateRadius}
+        futures = [executor.submit(searchWorker, game.boardSize, options, position, opponent,
+                                   self.settings(index), timeLimitMs)
+                   for index, executor in enumerate(self.executors)]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if game.control is not None:
+                game.control.poll(game.nodeCount)
+        totals, playouts, reused = {}, 0, 0
+        for future in futures:
+            children, stats = future.result()
+            playouts += stats["playouts"]
+            reused += stats["reused"]
+            for move, (visits, wins, terminal) in children.items():
+                seen = totals.setdefault(move, [0, 0.0, None])
+                seen[0] += visits
+                seen[1] += wins
+                seen[2] = terminal if terminal is not None else seen[2]
+        game.nodeCount += playouts
+        game.completedDepth = 1
+        self.lastSearch = {"playouts": playouts, "reused": reused, "nodes": len(totals) + 1,
+                           "searchMs": round((time.perf_counter() - start) * 1000, 3)}
+        if not totals:
+            return 0.0, None
+        move = max(totals, key=lambda move: (totals[move][2] == 1.0, totals[move][0]))
+        visits, wins, terminal = totals[move]
+        if terminal == 1.0:
+            return math.inf, move
+        return wins / visits if visits else 0.0, move
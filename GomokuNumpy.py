@@ -0,0 +1,84 @@
+from GomokuGame import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Vectorised form of Gomoku.evaluateFull. Every window (start cell, direction, up to
+# winCondition cells) is a row of flat board indices; cells past the board edge point at an
+# extra sentinel cell. Each window is read as a base-6 number of its cells and scored with
+# a lookup table built by replaying the scalar scan, break at the sentinel included, so the
+# whole board, or a batch of boards, is scored with one gather, one dot product and one
+# table lookup.
+class NumpyEvaluator:
+    sentinel = borderCell
+
+    def __init__(self, boardSize, winCondition=5):
+        if np is None:
+            raise ImportError("NumpyEvaluator needs numpy (pip install numpy)")
+        self.boardSize = boardSize
+        self.cellCount = boardSize * boardSize
+        windows = []
+        for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            for row in range(boardSize):
+                for col in range(boardSize):
+                    window = []
+                    for i in range(winCondition):
+                        r, c = row + dr * i, col + dc * i
+                        inside = 0 <= r < boardSize and 0 <= c < boardSize
+                        window.append(r * boardSize + c if inside else self.cellCount)
+                    windows.append(window)
+        self.windows = np.array(windows, dtype=np.intp)
+        self.powers = 6 ** np.arange(winCondition, dtype=np.int32)
+        self.tables = {player: np.array([self.windowScore(code, player, winCondition)
+                                         for code in range(6 ** winCondition)], dtype=np.int64)
+                       for player in (PLAYER, miniMaxAI, AlphaBetaAI)}
+
+    def windowScore(self, code, player, winCondition):
+        score = 0
+        cntMax, cntOpp = 0, 0
+        for _ in range(winCondition):
+            cell = code % 6
+            code //= 6
+            if cell == self.sentinel:
+                break
+            if cell == player:
+                cntMax += 1
+            elif cell != emptyCell:
+                cntOpp += 1
+            elif cntMax > 0 and cntOpp == 0:
+                score += windowWeights.get(cntMax, 0)
+            elif cntOpp > 0 and cntMax == 0:
+                score -= windowWeights.get(cntOpp, 0)
+        return score
+
+    # boards as an (n, boardSize * boardSize + 1) int8 array whose last column is the sentinel
+    def emptyBatch(self, count):
+        boards = np.zeros((count, self.cellCount + 1), dtype=np.int8)
+        boards[:, self.cellCount] = self.sentinel
+        return boards
+
+    # a Gomoku Board is copied straight from its bytes, a list of lists cell by cell
+    def boardArray(self, board):
+        boards = self.emptyBatch(1)
+        if isinstance(board, Board):
+            boards[0, :self.cellCount] = np.frombuffer(board.interior(), dtype=np.int8)
+        else:
+            boards[0, :self.cellCount] = np.asarray(board, dtype=np.int8).reshape(-1)
+        return boards
+
+    def evaluateBatch(self, boards, maximizingPlayer):
+        codes = boards[:, self.windows] @ self.powers
+        return self.tables[maximizingPlayer][codes].sum(axis=1)
+
+    def evaluate(self, board, maximizingPlayer):
+        return int(self.evaluateBatch(self.boardArray(board), maximizingPlayer)[0])
+
+    # one row per move: the current board with that move's stone added
+    def childBatch(self, board, moves, player):
+        boards = np.repeat(self.boardArray(board), len(moves), axis=0)
+        cells = [row * self.boardSize + col for row, col in moves]
+        boards[np.arange(len(moves)), cells] = player
+        return boards
@@ -0,0 +1,127 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from GomokuGame import *
+
+
+# per-process state of a pool worker: the bound shared by all workers of the pool and one
+# transposition table and move orderer per board size and set of game options, kept warm
+# between tasks unless the search has to be deterministic
+workerState = {"sharedAlpha": None, "tables": {}}
+
+
+def initWorker(sharedAlpha):
+    workerState["sharedAlpha"] = sharedAlpha
+
+
+# the constructor options a worker's game needs to restore the root's snapshot and search
+# the same moves as the root game would
+def workerOptions(game):
+    return {"evaluator": game.evaluator, "alphaBetaOpponent": game.alphaBetaOpponent,
+            "candidateRadius": game.candidateRadius, "symmetricTable": game.symmetricTable}
+
+
+def workerGame(boardSize, options, position, warm):
+    tables = workerState["tables"]
+    if not warm:
+        table, orderer = TranspositionTable(), MoveOrderer()
+    else:
+        key = (boardSize, options["candidateRadius"], options["symmetricTable"])
+        if key not in tables:
+            tables[key] = (TranspositionTable(), MoveOrderer())
+        table, orderer = tables[key]
+    game = Gomoku(boardSize, transpositionTable=table, moveOrderer=orderer, **options)
+    game.restore(position)
+    return game
+
+
+# (score, nodes, alpha): a score not above the alpha it was searched with is only an upper
+# bound. The eldest brother searches the full window; the others may start from the best
+# score reported so far.
+def searchRootMove(boardSize, options, position, engine, move, depth, alpha, shareBounds, eldest=False):
+    # tables left over from other tasks can hold deeper results, which would make scores
+    # depend on how tasks were scheduled
+    game = workerGame(boardSize, options, position, shareBounds)
+    sharedAlpha = workerState["sharedAlpha"]
+    if shareBounds and not eldest and engine == AlphaBetaAI and sharedAlpha is not None:
+        alpha = max(alpha, sharedAlpha.value)
+    if engine == AlphaBetaAI:
+        game.makeMove(*move, AlphaBetaAI)
+        score, _ = game.alphaBeta(depth - 1, False, alpha, math.inf)
+    else:
+        game.makeMove(*move, miniMaxAI)
+        score, _ = game.minimax(1, False, depth)
+    if shareBounds and engine == AlphaBetaAI and sharedAlpha is not None and score > sharedAlpha.value:
+        with sharedAlpha.get_lock():
+            if score > sharedAlpha.value:
+                sharedAlpha.value = score
+    return score, game.nodeCount, alpha
+
+
+# Splits the root moves of alphaBeta or minimax across a process pool, Young Brothers Wait
+# style: the first move in threat order is searched alone to get a real alpha, then the
+# other moves are searched in parallel against it. Unless deterministic is set, workers
+# also start from the best score any of them has reported so far. The best move is the
+# highest score, ties going to the earlier root move, so a deterministic search returns the
+# same move as a serial one over the same move order. A younger brother whose score does not
+# beat the alpha it was searched with failed low and is not a candidate.
+class ParallelSearch:
+    def __init__(self, workers=None, deterministic=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.deterministic = deterministic
+        self.sharedAlpha = multiprocessing.Value("d", -math.inf)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=initWorker, initargs=(self.sharedAlpha,))
+        self.nodeCount = 0
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(self, game, engine, depth, opponent=PLAYER):
+        if engine == AlphaBetaAI:
+            if game.lastMoveWins(AlphaBetaAI):
+                return math.inf, None
+            if game.lastMoveWins(game.alphaBetaOpponent):
+                return -math.inf, None
+        else:
+            if game.lastMoveWins(miniMaxAI):
+                return math.inf, None
+            if game.lastMoveWins(opponent):
+                return -math.inf, None
+        if depth == 0:
+            return game.evaluate(engine), None
+
+        position = game.snapshot()
+        options = workerOptions(game)
+        moves = sorted(game.getValidMoves(), key=lambda move: -game.threatScore(move[0], move[1], engine))
+        self.nodeCount = 1
+
+        def submit(move, alpha, eldest=False):
+            return self.executor.submit(searchRootMove, game.boardSize, options, position, engine, move, depth,
+                                        alpha, not self.deterministic, eldest)
+
+        # the pool may still hold the bound of the previous search
+        with self.sharedAlpha.get_lock():
+            self.sharedAlpha.value = -math.inf
+        eldestScore, nodes, _ = submit(moves[0], -math.inf, True).result()
+        self.nodeCount += nodes
+        scores = {0: eldestScore}
+        alpha = eldestScore if engine == AlphaBetaAI else -math.inf
+        with self.sharedAlpha.get_lock():
+            self.sharedAlpha.value = alpha
+        if eldestScore != math.inf:
+            futures = {submit(move, alpha): index for index, move in enumerate(moves) if index > 0}
+            for future in as_completed(futures):
+                score, nodes, searchedAlpha = future.result()
+                self.nodeCount += nodes
+                if engine != AlphaBetaAI or score > searchedAlpha:
+                    scores[futures[future]] = score
+        best = max(scores, key=lambda index: (scores[index], -index))
+        return scores[best], moves[best]
@@ -0,0 +1,68 @@
+import threading
+
+from GomokuGame import *
+
+
+# Thinks on the opponent's time. After the engine moves, start() searches the engine's answer
+# to each of the opponent's most threatening replies on a copy of the game that shares the
+# transposition table, so even the replies it did not predict are searched against a warm
+# table. The copy orders moves with a copy of the game's move orderer, so the pondering
+# thread never updates killers and history the game's own searches read. lookup() hands
+# back the stored answer when the opponent played one of them. stop() cancels the search
+# through its SearchControl; each start() gets its own control and results, so a stopped
+# search that is still unwinding cannot leak into the next one.
+class Ponderer:
+    def __init__(self, engine, depthLimit, timeLimitMs=None, opponent=PLAYER, replies=3):
+        self.engine = engine
+        self.depthLimit = depthLimit
+        self.timeLimitMs = timeLimitMs
+        self.opponent = opponent
+        self.replies = replies
+        self.thread = None
+        self.control = SearchControl()
+        self.results = {}
+
+    def start(self, game):
+        self.stop()
+        self.control = SearchControl()
+        self.results = {}
+        orderer = game.moveOrderer.copy() if game.moveOrderer is not None else None
+        copy = Gomoku(game.boardSize, backend=game.backend, transpositionTable=game.transpositionTable,
+                      moveOrderer=orderer, candidateRadius=game.candidateRadius,
+                      threatSolver=game.threatSolver, openingBook=game.openingBook,
+                      symmetricTable=game.symmetricTable, evaluator=game.evaluator,
+                      searchAlgorithm=game.searchAlgorithm, aspirationWindow=game.aspirationWindow,
+                      selectiveSearch=game.selectiveSearch)
+        copy.restore(game.snapshot())
+        self.thread = threading.Thread(target=self.ponder, args=(copy, self.control, self.results), daemon=True)
+        self.thread.start()
+
+    def stop(self, wait=False):
+        self.control.cancel()
+        if wait and self.thread is not None:
+            self.thread.join()
+
+    # the pondered (score, move) for game's position, or None
+    def lookup(self, game):
+        result = self.results.get(game.lastMove)
+        if result is None or result[0] != game.hash or not game.isValidMove(*result[2]):
+            return None
+        return result[1], result[2]
+
+    def ponder(self, game, control, results):
+        root = game.snapshot()
+        replies = sorted(game.getValidMoves(), key=lambda move: -game.threatScore(move[0], move[1], self.opponent))
+        for reply in replies[:self.replies]:
+            game.makeMove(*reply, self.opponent)
+            if game.isWinningMove(*reply) or game.freeCellsCounter() == 0:
+                game.restore(root)
+                continue
+            try:
+                score, move = game.findBestMove(self.engine, self.depthLimit, self.timeLimitMs, self.opponent,
+                                                control)
+            except SearchCancelled:
+                return
+            finally:
+                game.restore(root)
+            if move is not None:
+                results[reply] = (game.hash ^ game.zobrist[reply[0]][reply[1]][self.opponent], score, move)
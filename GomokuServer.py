@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import signal
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from GomokuGame import *
+from GomokuThreats import ThreatSolver
+from GomokuBook import loadBook
+from GomokuCache import loadSharedCache, sharedCache
+
+
+engines = {"minimax": miniMaxAI, "alphaBeta": AlphaBetaAI}
+# the players each engine can search against, its default first: minimax always plays its
+# replies as PLAYER, alphaBeta as its game's alphaBetaOpponent
+engineOpponents = {miniMaxAI: (PLAYER,), AlphaBetaAI: (miniMaxAI, PLAYER)}
+
+
+# per-process state of a search worker: one transposition table and move orderer per game
+# id, least recently used dropped first, and the opening book of each board size; with a
+# cache file every game searches against the worker's process-wide cache instead
+workerState = {"games": OrderedDict(), "books": {}, "maxGames": 64, "cachePath": None}
+
+
+def initWorker(maxGames, cachePath):
+    # Ctrl+C reaches the whole process group; the server shuts the workers down itself,
+    # after they have saved their caches
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    workerState["maxGames"] = maxGames
+    workerState["cachePath"] = cachePath
+    if cachePath is not None:
+        loadSharedCache(cachePath)
+
+
+def saveWorkerCache():
+    return sharedCache().save(workerState["cachePath"])
+
+
+def newTables():
+    table = sharedCache() if workerState["cachePath"] is not None else TranspositionTable()
+    return table, MoveOrderer()
+
+
+def workerTables(gameId):
+    games = workerState["games"]
+    if gameId is None:
+        return newTables()
+    if gameId in games:
+        games.move_to_end(gameId)
+    else:
+        games[gameId] = newTables()
+        while len(games) > workerState["maxGames"]:
+            games.popitem(last=False)
+    return games[gameId]
+
+
+def workerBook(boardSize):
+    books = workerState["books"]
+    if boardSize not in books:
+        books[boardSize] = loadBook(boardSize)
+    return books[boardSize]
+
+
+# runs in a worker process: replays the position and searches it with the request's budget
+def searchPosition(request):
+    start = time.perf_counter()
+    table, orderer = workerTables(request["game"])
+    stats = SearchStats() if request["stats"] else None
+    game = Gomoku(request["boardSize"], transpositionTable=table, moveOrderer=orderer, stats=stats,
+                  threatSolver=ThreatSolver(), openingBook=workerBook(request["boardSize"]),
+                  evaluator=request["evaluator"], searchAlgorithm="pvs" if request["selective"] else request["search"],
+                  selectiveSearch=SelectiveSearch.level(request["selective"]) if request["selective"] else None,
+                  alphaBetaOpponent=request["opponent"] if request["engine"] == AlphaBetaAI else miniMaxAI)
+    for row, col, player in request["moves"]:
+        if not game.makeMove(row, col, player):
+            return {"error": f"illegal move {[row, col, player]}"}
+    random.seed(request["seed"])
+    score, move = game.findBestMove(request["engine"], request["depth"], request["timeMs"], request["opponent"])
+    result = {"move": list(move) if move is not None else None,
+              "score": score if score not in (math.inf, -math.inf) else None,
+              "forced": "win" if score == math.inf else "loss" if score == -math.inf else None,
+              "depth": game.completedDepth, "nodes": game.nodeCount, "table": table.stats(),
+              "searchMs": round((time.perf_counter() - start) * 1000, 3), "worker": os.getpid()}
+    if stats is not None:
+        result["stats"] = stats.toDict()
+    return result
+
+
+# the id of a request that failed validation, so that its error can still be matched to it
+def messageId(message):
+    try:
+        request = json.loads(message)
+    except ValueError:
+        return None
+    return request.get("id") if isinstance(request, dict) else None
+
+
+def parseRequest(message, limits):
+    request = json.loads(message)
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    boardSize = int(request.get("boardSize", 15))
+    if not 5 <= boardSize <= 19:
+        raise ValueError("boardSize must be between 5 and 19")
+    engine = request.get("engine", "alphaBeta")
+    if engine not in engines:
+        raise ValueError(f"engine must be one of {sorted(engines)}")
+    evaluator = request.get("evaluator", "window")
+    if evaluator not in evaluators:
+        raise ValueError(f"evaluator must be one of {list(evaluators)}")
+    search = request.get("search", "alphaBeta")
+    if search not in searchAlgorithms:
+        raise ValueError(f"search must be one of {list(searchAlgorithms)}")
+    selective = request.get("selective")
+    if selective is not None and selective not in selectiveLevels:
+        raise ValueError(f"selective must be one of {sorted(selectiveLevels)}")
+    moves = [(int(row), int(col), int(player)) for row, col, player in request.get("moves", [])]
+    if any(player not in (PLAYER, miniMaxAI, AlphaBetaAI) for _, _, player in moves):
+        raise ValueError("move players must be 1, 2 or 3")
+    opponents = engineOpponents[engines[engine]]
+    opponent = int(request.get("opponent", opponents[0]))
+    if opponent not in opponents:
+        raise ValueError(f"opponent of {engine} must be one of {list(opponents)}")
+    return {"id": request.get("id"), "game": request.get("game"), "boardSize": boardSize, "moves": moves,
+            "engine": engines[engine], "evaluator": evaluator, "search": search, "selective": selective,
+            "opponent": opponent,
+            "depth": max(1, min(int(request.get("depth", 2)), limits["maxDepth"])),
+            "timeMs": max(0, min(int(request.get("timeMs", 0)), limits["maxTimeMs"])),
+            "seed": int(request.get("seed", 0)), "stats": bool(request.get("stats", False))}
+
+
+# JSON over TCP, one object per line each way. Searches run in a pool of single-process
+# executors so that every game id always lands on the same worker and finds its
+# transposition table warm there; requests without a game id go to the least busy worker.
+# At most maxQueue searches are pending across all connections, further requests are
+# answered with a busy error at once, and each connection may have perConnection searches
+# in flight. Given a cachePath, worker i keeps its cache in cachePath.i between runs; game
+# ids map to the same worker as long as the worker count stays the same.
+class SearchServer:
+    def __init__(self, workers=None, maxQueue=64, perConnection=4, maxDepth=6, maxTimeMs=10000, maxGames=64,
+                 cachePath=None):
+        self.cachePath = cachePath
+        self.workers = [ProcessPoolExecutor(1, initializer=initWorker,
+                                            initargs=(maxGames, None if cachePath is None else f"{cachePath}.{index}"))
+                        for index in range(workers or os.cpu_count() or 1)]
+        self.busy = [0] * len(self.workers)
+        self.maxQueue = maxQueue
+        self.perConnection = perConnection
+        self.limits = {"maxDepth": maxDepth, "maxTimeMs": maxTimeMs}
+        self.pending = 0
+
+    def close(self):
+        if self.cachePath is not None:
+            saved = [executor.submit(saveWorkerCache) for executor in self.workers]
+            print(f"saved {sum(future.result() for future in saved)} cache entries", flush=True)
+        for executor in self.workers:
+            executor.shutdown(cancel_futures=True)
+
+    def pickWorker(self, gameId):
+        if gameId is not None:
+            return zlib.crc32(str(gameId).encode()) % len(self.workers)
+        return min(range(len(self.workers)), key=self.busy.__getitem__)
+
+    async def search(self, request):
+        if self.pending >= self.maxQueue:
+            return {"error": "busy"}
+        worker = self.pickWorker(request["game"])
+        self.pending += 1
+        self.busy[worker] += 1
+        queued = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.workers[worker], searchPosition, request)
+        finally:
+            self.pending -= 1
+            self.busy[worker] -= 1
+        result["totalMs"] = round((time.perf_counter() - queued) * 1000, 3)
+        return result
+
+    async def answer(self, message, writer, slots):
+        try:
+            try:
+                request = parseRequest(message, self.limits)
+            except (ValueError, TypeError, KeyError) as error:
+                result, requestId = {"error": str(error)}, messageId(message)
+            else:
+                requestId = request["id"]
+                try:
+                    result = await self.search(request)
+                except Exception as error:
+                    result = {"error": f"search failed: {error}"}
+            result["id"] = requestId
+            writer.write((json.dumps(result) + "\n").encode())
+            await writer.drain()
+        finally:
+            slots.release()
+
+    async def handle(self, reader, writer):
+        slots = asyncio.Semaphore(self.perConnection)
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # wait for a slot before reading on, so a client cannot queue unbounded work
+                await slots.acquire()
+                task = asyncio.create_task(self.answer(line, writer, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"serving on {host}:{port} with {len(self.workers)} workers", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+async def loadTest(args):
+    positions = []
+    rng = random.Random(args.seed)
+    for _ in range(args.positions):
+        game = Gomoku(args.size)
+        center = args.size // 2
+        game.makeMove(center, center, miniMaxAI)
+        player = AlphaBetaAI
+        while len(game.moveHistory) < args.stones:
+            row, col = rng.choice(sorted(game.getValidMoves()))
+            game.makeMove(row, col, player)
+            if game.isWinningMove(row, col):
+                game.undoMove(row, col)
+                continue
+            player = miniMaxAI if player == AlphaBetaAI else AlphaBetaAI
+        positions.append([[row, col, game.board[row][col]] for row, col in game.moveHistory])
+
+    latencies, errors = [], {}
+
+    async def client(index):
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        for number in range(args.requests):
+            request = {"id": f"{index}-{number}", "game": f"load-{index}", "boardSize": args.size,
+                       "moves": positions[(index + number) % len(positions)], "engine": "alphaBeta",
+                       "depth": args.depth, "timeMs": args.time_ms}
+            sent = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            if "error" in reply:
+                errors[reply["error"]] = errors.get(reply["error"], 0) + 1
+            else:
+                latencies.append((time.perf_counter() - sent) * 1000)
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{len(latencies)} searches in {elapsed:.2f}s = {len(latencies) / elapsed:.1f}/s, errors {errors or 0}")
+    if latencies:
+        for name, share in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            print(f"{name} {latencies[min(len(latencies) - 1, int(share * len(latencies)))]:.1f} ms")
+
+
+# runs requests through parseRequest and searchPosition in this process: an opponent of
+# either colour with an open four must be seen as a forced loss, and an opponent an engine
+# cannot search against must be refused
+def checkRequests():
+    limits = {"maxDepth": 6, "maxTimeMs": 10000}
+    failures = []
+    for opponent in engineOpponents[AlphaBetaAI]:
+        moves = [[7, col, opponent] for col in range(4, 8)] + [[3, 3, AlphaBetaAI], [3, 5, AlphaBetaAI],
+                                                               [10, 10, AlphaBetaAI]]
+        request = parseRequest(json.dumps({"id": opponent, "boardSize": 15, "moves": moves, "engine": "alphaBeta",
+                                           "opponent": opponent, "depth": 2}), limits)
+        result = searchPosition(request)
+        print(f"alphaBeta against {opponent} with an open four: move {result['move']}, forced {result['forced']}")
+        if result["forced"] != "loss":
+            failures.append(f"opponent {opponent}")
+    try:
+        parseRequest(json.dumps({"engine": "minimax", "opponent": miniMaxAI}), limits)
+        failures.append("minimax accepted opponent 2")
+    except ValueError as error:
+        print(f"minimax against 2 refused: {error}")
+    if failures:
+        print("FAILED: " + ", ".join(failures))
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gomoku search service, JSON over TCP, one object per line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=None, help="search processes (default: CPU count)")
+    serve.add_argument("--max-queue", type=int, default=64, help="searches pending before requests are refused")
+    serve.add_argument("--per-connection", type=int, default=4, help="searches in flight per connection")
+    serve.add_argument("--max-depth", type=int, default=6)
+    serve.add_argument("--max-time-ms", type=int, default=10000)
+    serve.add_argument("--max-games", type=int, default=64, help="transposition tables kept per worker")
+    serve.add_argument("--cache", default=None, help="search cache file prefix, loaded at start and saved on exit")
+
+    load = commands.add_parser("loadtest", help="hammer a running server and report latencies")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=8765)
+    load.add_argument("--connections", type=int, default=8)
+    load.add_argument("--requests", type=int, default=10, help="requests per connection")
+    load.add_argument("--size", type=int, default=15)
+    load.add_argument("--stones", type=int, default=8)
+    load.add_argument("--positions", type=int, default=4)
+    load.add_argument("--depth", type=int, default=2)
+    load.add_argument("--time-ms", type=int, default=0)
+    load.add_argument("--seed", type=int, default=0)
+
+    commands.add_parser("check", help="search canned requests in this process and check the answers")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = SearchServer(args.workers, args.max_queue, args.per_connection, args.max_depth, args.max_time_ms,
+                              args.max_games, args.cache)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    elif args.command == "check":
+        checkRequests()
+    else:
+        asyncio.run(loadTest(args))
+
+
+if __name__ == "__main__":
+    main()
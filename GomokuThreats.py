@@ -0,0 +1,172 @@
+import math
+import time
+
+from GomokuGame import *
+
+
+directions = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+# Threat-space search for forced wins. VCF (victory by continuous fours) only plays fours,
+# each of which leaves the defender a single cell to block. VCT (victory by continuous
+# threats) also plays moves that threaten an open four, and then has to beat every block
+# and every counter-four of the defender. Both only look at forcing moves, so they reach far
+# deeper than the full-width search within their own node and time limits.
+class ThreatSolver:
+    def __init__(self, maxNodes=20000, timeLimitMs=200, vcfDepth=12, vctDepth=2):
+        self.maxNodes = maxNodes
+        self.timeLimitMs = timeLimitMs
+        self.vcfDepth = vcfDepth
+        self.vctDepth = vctDepth
+        self.nodes = 0
+        self.deadline = None
+        self.control = None
+
+    # the forced line for attacker (alternating attacker and defender moves), or None; a
+    # timeLimitMs shorter than the solver's own caps it, so it stays inside a move's budget
+    def findWin(self, game, attacker, defender, timeLimitMs=None):
+        self.nodes = 0
+        self.deadline = time.perf_counter() + min(self.timeLimitMs, timeLimitMs or math.inf) / 1000
+        self.control = game.control
+        rootLength = len(game.moveHistory)
+        defenders = set(game.board.interior()) - {emptyCell, attacker}
+        defenders.add(defender)
+        try:
+            line = self.vcf(game, attacker, defenders, defender, self.vcfDepth)
+            if line is None and self.vctDepth > 0:
+                line = self.vct(game, attacker, defenders, defender, self.vctDepth)
+        except SearchCancelled:
+            raise
+        except SearchTimeout:
+            line = None
+        finally:
+            while len(game.moveHistory) > rootLength:
+                game.undoMove(*game.moveHistory[-1])
+            self.control = None
+        return line
+
+    # running out of nodes or time only ends the solver; a cancel ends the whole search. A
+    # node scans the whole board, so the clock is read at every one of them.
+    def tick(self):
+        self.nodes += 1
+        if self.nodes > self.maxNodes:
+            raise SearchTimeout
+        if self.control is not None and self.control.cancelled.is_set():
+            raise SearchCancelled
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    def winningCells(self, game, player):
+        return [(row, col) for row, col in game.getValidMoves() if game.wouldWin(row, col, player)]
+
+    def lineCells(self, game, row, col, dr, dc):
+        size = game.boardSize
+        board, rowStart = game.cells, game.rowStart
+        cells = []
+        for step in range(1 - game.winCondition, game.winCondition):
+            r, c = row + dr * step, col + dc * step
+            if step and 0 <= r < size and 0 <= c < size and board[rowStart[r] + c] == emptyCell:
+                cells.append((r, c))
+        return cells
+
+    def stonesNear(self, game, row, col, dr, dc, player):
+        size = game.boardSize
+        board, rowStart = game.cells, game.rowStart
+        count = 0
+        for step in range(1 - game.winCondition, game.winCondition):
+            r, c = row + dr * step, col + dc * step
+            if 0 <= r < size and 0 <= c < size and board[rowStart[r] + c] == player:
+                count += 1
+        return count
+
+    # cells that complete five on the lines through (row, col)
+    def completions(self, game, row, col, player, lines=directions):
+        return [cell for dr, dc in lines for cell in self.lineCells(game, row, col, dr, dc)
+                if game.wouldWin(cell[0], cell[1], player)]
+
+    def fourMoves(self, game, attacker, candidates):
+        moves = []
+        for row, col in candidates:
+            if not any(self.stonesNear(game, row, col, dr, dc, attacker) >= game.winCondition - 2
+                       for dr, dc in directions):
+                continue
+            game.makeMove(row, col, attacker)
+            completions = self.completions(game, row, col, attacker)
+            game.undoMove(row, col)
+            if completions:
+                moves.append((len(set(completions)), (row, col), completions))
+        moves.sort(key=lambda item: item[0], reverse=True)
+        return moves
+
+    def vcf(self, game, attacker, defenders, defender, depth):
+        self.tick()
+        wins = self.winningCells(game, attacker)
+        if wins:
+            return [wins[0]]
+        threats = {cell for player in defenders for cell in self.winningCells(game, player)}
+        if len(threats) > 1 or depth == 0:
+            return None
+        for _, move, completions in self.fourMoves(game, attacker, threats or game.getValidMoves()):
+            completions = set(completions)
+            if len(completions) > 1:
+                return [move]
+            block = completions.pop()
+            game.makeMove(*move, attacker)
+            game.makeMove(*block, defender)
+            line = None
+            if not game.isWinningMove(*block):
+                rest = self.vcf(game, attacker, defenders, defender, depth - 1)
+                if rest is not None:
+                    line = [move, block] + rest
+            game.undoMove(*block)
+            game.undoMove(*move)
+            if line is not None:
+                return line
+        return None
+
+    # moves after which attacker threatens an open (or double) four on the same line
+    def threeMoves(self, game, attacker):
+        moves = []
+        for row, col in game.getValidMoves():
+            lines = [(dr, dc) for dr, dc in directions
+                     if self.stonesNear(game, row, col, dr, dc, attacker) >= game.winCondition - 3]
+            if not lines:
+                continue
+            game.makeMove(row, col, attacker)
+            for dr, dc in lines:
+                threat = [cell for cell in self.lineCells(game, row, col, dr, dc)
+                          if self.makesOpenFour(game, cell, attacker, (dr, dc))]
+                if threat:
+                    moves.append(((row, col), (dr, dc)))
+                    break
+            game.undoMove(row, col)
+        return moves
+
+    def makesOpenFour(self, game, cell, attacker, line):
+        game.makeMove(*cell, attacker)
+        completions = set(self.completions(game, cell[0], cell[1], attacker, (line,)))
+        game.undoMove(*cell)
+        return len(completions) > 1
+
+    def vct(self, game, attacker, defenders, defender, depth):
+        line = self.vcf(game, attacker, defenders, defender, self.vcfDepth)
+        if line is not None or depth == 0:
+            return line
+        if any(self.winningCells(game, player) for player in defenders):
+            return None
+        for move, (dr, dc) in self.threeMoves(game, attacker):
+            game.makeMove(*move, attacker)
+            defenses = set(self.lineCells(game, move[0], move[1], dr, dc))
+            defenses.update(cell for _, cell, _ in self.fourMoves(game, defender, game.getValidMoves()))
+            refuted = False
+            for block in defenses:
+                game.makeMove(*block, defender)
+                refuted = game.isWinningMove(*block) or \
+                    self.vct(game, attacker, defenders, defender, depth - 1) is None
+                game.undoMove(*block)
+                if refuted:
+                    break
+            game.undoMove(*move)
+            if not refuted:
+                return [move]
+        return None
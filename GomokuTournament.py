@@ -0,0 +1,131 @@
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from GomokuGame import *
+from GomokuThreats import ThreatSolver
+from GomokuMCTS import MonteCarloSearch
+
+
+engineNames = {miniMaxAI: "minimax", AlphaBetaAI: "alphaBeta", mctsAI: "mcts"}
+# the engine pairs that can meet; --depths gives each pair's depths in this order, and mcts
+# ignores its depth for --playouts
+matches = {"minimax:alphaBeta": (miniMaxAI, AlphaBetaAI), "mcts:alphaBeta": (mctsAI, AlphaBetaAI),
+           "mcts:minimax": (mctsAI, miniMaxAI)}
+
+
+def aiMove(game, player, opponent, depth, timeLimitMs):
+    return game.findBestMove(player, depth, timeLimitMs, opponent)
+
+
+# Opening stones are random (seeded) cells near the centre, so games with the same settings
+# differ while every game can be replayed from its seed.
+def playGame(gameId, boardSize, depths, first, openingMoves, timeLimitMs, seed, threats, evaluator, searchAlgorithm,
+             selective, playouts=1000, mctsWorkers=1):
+    rng = random.Random(seed)
+    random.seed(seed)
+    engines = tuple(depths)
+    other = {engines[0]: engines[1], engines[1]: engines[0]}
+    monteCarlo = MonteCarloSearch(playouts, workers=mctsWorkers, seed=seed) if mctsAI in engines else None
+    game = Gomoku(boardSize, transpositionTable=TranspositionTable(), moveOrderer=MoveOrderer(),
+                  threatSolver=ThreatSolver() if threats else None, evaluator=evaluator,
+                  searchAlgorithm="pvs" if selective else searchAlgorithm,
+                  selectiveSearch=SelectiveSearch.level(selective) if selective else None,
+                  alphaBetaOpponent=other.get(AlphaBetaAI, miniMaxAI), monteCarlo=monteCarlo)
+    player = first
+    center = boardSize // 2
+    record = {"game": gameId, "boardSize": boardSize, "seed": seed, "first": engineNames[first],
+              "depths": {engineNames[p]: d for p, d in depths.items() if p != mctsAI}, "timeLimitMs": timeLimitMs,
+              "evaluator": evaluator, "searchAlgorithm": searchAlgorithm, "selective": selective, "moves": []}
+    if monteCarlo is not None:
+        record["playouts"] = playouts
+    for _ in range(openingMoves):
+        candidates = sorted(move for move in game.getValidMoves()
+                            if abs(move[0] - center) <= 2 and abs(move[1] - center) <= 2)
+        row, col = rng.choice(candidates or sorted(game.getValidMoves()))
+        game.makeMove(row, col, player)
+        record["moves"].append({"player": engineNames[player], "move": [row, col], "opening": True})
+        player = other[player]
+
+    winner = None
+    start = time.perf_counter()
+    while True:
+        if not any(emptyCell in row for row in game.board) or game.isDraw():
+            break
+        game.nodeCount = 0
+        moveStart = time.perf_counter()
+        _, move = aiMove(game, player, other[player], depths[player], timeLimitMs)
+        latency = (time.perf_counter() - moveStart) * 1000
+        if move is None:
+            break
+        game.makeMove(*move, player)
+        record["moves"].append({"player": engineNames[player], "move": list(move), "latencyMs": round(latency, 3),
+                                "nodes": game.nodeCount, "depth": game.completedDepth})
+        if game.checkWinner(player):
+            winner = engineNames[player]
+            break
+        player = other[player]
+    record["winner"] = winner or "draw"
+    record["plies"] = len(record["moves"])
+    record["durationMs"] = round((time.perf_counter() - start) * 1000, 3)
+    if monteCarlo is not None:
+        monteCarlo.close()
+    return record
+
+
+def schedule(args):
+    gameId = 0
+    for boardSize in args.sizes:
+        for pair in args.depths:
+            firstDepth, secondDepth = (int(d) for d in pair.split(":"))
+            engines = matches[args.match]
+            for index in range(args.games):
+                first = engines[index % 2]
+                yield (gameId, boardSize, {engines[0]: firstDepth, engines[1]: secondDepth}, first,
+                       args.opening_moves, args.time_ms, args.seed + gameId, args.threats, args.evaluator,
+                       args.search, args.selective, args.playouts, args.mcts_workers)
+                gameId += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless engine vs engine tournament, one JSON line per game")
+    parser.add_argument("--match", choices=matches, default="minimax:alphaBeta", help="the two engines that play")
+    parser.add_argument("--games", type=int, default=4, help="games per board size and depth pair")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[9, 15])
+    parser.add_argument("--depths", nargs="+", default=["2:2"],
+                        help="depth pairs of the match's engines in its order, e.g. 2:3 (mcts ignores its depth)")
+    parser.add_argument("--playouts", type=int, default=1000, help="playouts per mcts move without --time-ms")
+    parser.add_argument("--mcts-workers", type=int, default=1, help="root-parallel processes of each mcts search")
+    parser.add_argument("--time-ms", type=int, default=0, help="time budget per move (0 = fixed depth)")
+    parser.add_argument("--opening-moves", type=int, default=2, help="random stones placed before the engines play")
+    parser.add_argument("--threats", action="store_true", help="let both engines run the VCF/VCT solver first")
+    parser.add_argument("--evaluator", choices=evaluators, default="window", help="leaf evaluation of both engines")
+    parser.add_argument("--search", choices=searchAlgorithms, default="alphaBeta", help="search of the alphaBeta engine")
+    parser.add_argument("--selective", choices=sorted(selectiveLevels), default=None,
+                        help="late move reductions and beam pruning at this level (implies --search pvs)")
+    parser.add_argument("--workers", type=int, default=None, help="parallel game processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON Lines file (default stdout)")
+    args = parser.parse_args()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    wins = {}
+    try:
+        with ProcessPoolExecutor(args.workers) as executor:
+            futures = [executor.submit(playGame, *game) for game in schedule(args)]
+            for future in as_completed(futures):
+                record = future.result()
+                wins[record["winner"]] = wins.get(record["winner"], 0) + 1
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("results: " + ", ".join(f"{name} {count}" for name, count in sorted(wins.items())), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()